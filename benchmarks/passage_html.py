@@ -0,0 +1,143 @@
+"""
+Measure passage HTML rendering in blocks per second.
+
+Compares the displacy and BeautifulSoup renderer which `text_block_to_html` used to
+use with `src.opensearch.passage_html.spans_to_html`, on synthetic blocks with
+overlapping concept spans. Tokenizing is timed separately, as both need it. The
+outputs are checked to be identical. Run with:
+
+    poetry run python -m benchmarks.passage_html
+"""
+
+import random
+import time
+from bisect import bisect_right
+from typing import Callable
+
+import click
+import spacy
+from bs4 import BeautifulSoup
+from spacy import displacy
+
+from src.opensearch.passage_html import spans_to_html
+
+WORDS = "climate adaptation finance (GHG) emissions, mitigation coal energy R&D sector policy loss and damage. resilience 2030 net-zero".split()
+LABELS = [
+    "Greenhouse Gases – Oil",
+    "Fossil Fuels – Coal",
+    "Deforestation – All",
+    "Vulnerable Groups – Women And Children",
+    "Technologies – Solar Power",
+]
+
+nlp = spacy.blank("en")
+
+
+def tokenize(text: str) -> list[tuple[str, int]]:
+    return [(token.text, token.idx) for token in nlp.tokenizer(text)]
+
+
+def displacy_html(
+    text: str, tokens: list[tuple[str, int]], spans: list[tuple[int, int, str]]
+) -> str:
+    """Render a block as `text_block_to_html` did with displacy and BeautifulSoup."""
+    token_starts = [start for _, start in tokens]
+    block_object = {
+        "text": text,
+        "spans": [
+            {
+                "start_token": bisect_right(token_starts, start) - 1,
+                "end_token": bisect_right(token_starts, end),
+                "label": label,
+            }
+            for start, end, label in spans
+        ],
+        "tokens": [token for token, _ in tokens],
+        "title": None,
+    }
+    block_html = displacy.render([block_object], style="span", manual=True).replace(
+        "</br>", " "
+    )
+    soup = BeautifulSoup(block_html, "html.parser")
+
+    for span in soup.find_all("span", {"style": lambda x: "z-index: 10" in x}):
+        span.attrs["class"] = "span-label"
+        span.attrs["id"] = span.text.strip()
+        span.parent.parent.attrs["class"] = (
+            "text-highlight" + " " + span.text.strip().replace(" ", "-")
+        )
+
+        concept, subconcept = [i.strip() for i in span.text.strip().split("–")]
+        concept_span = soup.new_tag("span")
+        concept_span.attrs["class"] = "concept-label"
+        concept_span.string = concept + " – "
+        subconcept_span = soup.new_tag("span")
+        subconcept_span.attrs["class"] = "subconcept-label"
+        subconcept_span.string = subconcept
+
+        span.string.replace_with("")
+        span.append(concept_span)
+        span.append(subconcept_span)
+
+    return soup.prettify()
+
+
+def make_blocks(
+    n: int, words_per_block: int, spans_per_block: int
+) -> list[tuple[str, list[tuple[int, int, str]]]]:
+    """Build `n` blocks of text with randomly placed, possibly overlapping spans."""
+    rng = random.Random(0)
+    blocks = []
+
+    for _ in range(n):
+        text = " ".join(rng.choice(WORDS) for _ in range(words_per_block))
+        spans = []
+
+        for _ in range(spans_per_block):
+            start = rng.randrange(len(text))
+            end = min(start + rng.randint(1, 40), len(text))
+            spans.append((start, end, rng.choice(LABELS)))
+
+        blocks.append((text, spans))
+
+    return blocks
+
+
+def blocks_per_second(func: Callable[[], object], n: int) -> float:
+    start = time.perf_counter()
+    func()
+    return n / (time.perf_counter() - start)
+
+
+@click.command()
+@click.option("--blocks", type=int, default=2000)
+@click.option("--words-per-block", type=int, default=80)
+def main(blocks: int, words_per_block: int):
+    click.echo(f"{'spans':>6} {'renderer':>14} {'blocks/s':>10}")
+
+    for spans_per_block in (0, 2, 8):
+        block_list = make_blocks(blocks, words_per_block, spans_per_block)
+        tokenized = [(text, tokenize(text), spans) for text, spans in block_list]
+
+        for text, tokens, spans in tokenized[:100]:
+            if displacy_html(text, tokens, spans) != spans_to_html(text, tokens, spans):
+                raise click.ClickException("Renderers' output differs")
+
+        results = {
+            "tokenize": blocks_per_second(
+                lambda: [tokenize(text) for text, _ in block_list], blocks
+            ),
+            "displacy": blocks_per_second(
+                lambda: [displacy_html(*block) for block in tokenized], blocks
+            ),
+            "spans_to_html": blocks_per_second(
+                lambda: [spans_to_html(*block) for block in tokenized], blocks
+            ),
+        }
+
+        for name, rate in results.items():
+            click.echo(f"{spans_per_block:>6} {name:>14} {rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
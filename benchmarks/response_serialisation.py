@@ -0,0 +1,112 @@
+"""
+Measure serialisation time and size of /search responses.
+
+Compares FastAPI's default path (`jsonable_encoder` then the standard library
+encoder), the standard library encoder on its own, and orjson, then the bytes sent
+uncompressed, with gzip and with brotli. Responses are synthetic but shaped like
+OpenSearch results, with highlighted HTML passages. Run with:
+
+    poetry run python -m benchmarks.response_serialisation
+"""
+
+import random
+import time
+from typing import Callable
+
+import click
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from src.compression import COMPRESSORS
+
+WORDS = "climate adaptation finance emissions mitigation coal energy sector policy loss damage resilience".split()
+
+
+def make_search_response(hits: int, words_per_passage: int) -> dict:
+    """Build a search response with `hits` hits of about `words_per_passage` words each."""
+    rng = random.Random(0)
+
+    def hit(position: int) -> dict:
+        text = " ".join(rng.choice(WORDS) for _ in range(words_per_passage))
+        text_html = (
+            f'<span class="span-type" data-span="Mitigation – All">{text}</span>'
+        )
+
+        return {
+            "_index": "global-stocktake",
+            "_id": str(position),
+            "_score": rng.random(),
+            "_source": {
+                "document_id": f"doc-{position // 5}",
+                "text_block_id": f"b{position}",
+                "text": text,
+                "text_html": text_html,
+                "span_types": ["Mitigation – All", "Fossil fuels – Coal"],
+                "document_metadata": {
+                    "document_name": f"Submission {position // 5}",
+                    "author": ["Party A", "Party B"],
+                    "date": "2023-06-01",
+                    "types": ["Submission"],
+                },
+            },
+            "highlight": {"text_html": [text_html]},
+        }
+
+    return {
+        "took": 12,
+        "timed_out": False,
+        "hits": {
+            "total": {"value": 10000, "relation": "gte"},
+            "hits": [hit(position) for position in range(hits)],
+        },
+    }
+
+
+def time_call(func: Callable[[], bytes], repeat: int) -> tuple[float, bytes]:
+    """Return the mean time in milliseconds for `func`, and its last result."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def compress(encoding: str, body: bytes) -> bytes:
+    compressor = COMPRESSORS[encoding]()
+    return compressor.compress(body) + compressor.finish()
+
+
+@click.command()
+@click.option("--words-per-passage", type=int, default=120)
+@click.option("--repeat", type=int, default=20)
+def main(words_per_passage: int, repeat: int):
+    click.echo(
+        f"{'hits':>6} {'serialiser':>22} {'ms':>8} {'encoding':>9} {'ms':>8} {'bytes':>10}"
+    )
+
+    for hits in (10, 100, 1000):
+        response = make_search_response(hits, words_per_passage)
+        serialisers = {
+            "jsonable_encoder+json": lambda: JSONResponse(
+                jsonable_encoder(response)
+            ).body,
+            "json": lambda: JSONResponse(response).body,
+            "orjson": lambda: ORJSONResponse(response).body,
+        }
+
+        for name, serialise in serialisers.items():
+            serialise_ms, body = time_call(serialise, repeat)
+            click.echo(
+                f"{hits:>6} {name:>22} {serialise_ms:>8.2f} {'identity':>9} {0:>8.2f} {len(body):>10}"
+            )
+
+        for encoding in COMPRESSORS:
+            compress_ms, compressed = time_call(
+                lambda: compress(encoding, body), repeat
+            )
+            click.echo(
+                f"{hits:>6} {'orjson':>22} {serialise_ms:>8.2f} {encoding:>9} {compress_ms:>8.2f} {len(compressed):>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Measure /search throughput at different numbers of concurrent clients.
+
+OpenSearch is replaced by a local stand-in which sleeps for a fixed time on every
+call, to mimic the network round trip to the cluster. Run with:
+
+    poetry run python -m benchmarks.search_concurrency
+"""
+
+import asyncio
+import time
+
+import click
+import httpx
+from openmock.fake_opensearch import FakeOpenSearch
+from openmock.fake_indices import FakeIndicesClient
+from opensearchpy.exceptions import NotFoundError
+
+import src.main
+from src.main import app
+from src.opensearch.client import get_opensearch_client
+
+
+class FakeIndicesClientWithoutAliases(FakeIndicesClient):
+    """Fake indices client for a cluster with no aliases."""
+
+    def get_alias(self, name=None, index=None, params=None, headers=None):
+        """Raise NotFoundError, as no aliases exist."""
+        raise NotFoundError(404, "aliases_not_found_exception")
+
+
+class SlowFakeOpenSearch(FakeOpenSearch):
+    """Fake OpenSearch client which blocks for `latency` seconds on every search."""
+
+    def __init__(self, latency: float, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+
+    def search(self, *args, **kwargs):
+        """Search after sleeping for `latency` seconds."""
+        time.sleep(self.latency)
+        return super().search(*args, **kwargs)
+
+    @property
+    def indices(self):
+        """Get the fake indices client."""
+        return FakeIndicesClientWithoutAliases(self)
+
+
+async def _call_blocking(func, *args, **kwargs):
+    """Call the client directly on the event loop, as the API did before."""
+    return func(*args, **kwargs)
+
+
+async def measure_throughput(concurrency: int, requests_per_client: int) -> float:
+    """Return requests per second for `concurrency` clients each making sequential searches."""
+
+    async def run_client(client: httpx.AsyncClient):
+        for _ in range(requests_per_client):
+            response = await client.post("/search", json={"text": ""})
+            response.raise_for_status()
+
+    async with httpx.AsyncClient(app=app, base_url="http://benchmark") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[run_client(client) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    return concurrency * requests_per_client / elapsed
+
+
+@click.command()
+@click.option("--latency", type=float, default=0.05, help="Simulated latency (s)")
+@click.option("--requests-per-client", type=int, default=5)
+@click.option(
+    "--blocking",
+    is_flag=True,
+    default=False,
+    help="Call OpenSearch on the event loop to show the behaviour before offloading",
+)
+def main(latency: float, requests_per_client: int, blocking: bool):
+    fake_opns = SlowFakeOpenSearch(latency=latency)
+    fake_opns.indices.create("global-stocktake")
+    app.dependency_overrides[get_opensearch_client] = lambda: fake_opns
+
+    # Every request is the same, so turn off the result cache to measure OpenSearch calls
+    src.main.search_cache.max_bytes = 0
+
+    if blocking:
+        src.main.run_in_executor = _call_blocking
+
+    click.echo(f"{'clients':>8} {'req/s':>10}")
+    for concurrency in (1, 10, 100):
+        throughput = asyncio.run(measure_throughput(concurrency, requests_per_client))
+        click.echo(f"{concurrency:>8} {throughput:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Admission control for requests which search OpenSearch.
+
+At most `max_in_flight` searches are sent to the cluster at once by each API process.
+Searches over that wait in a bounded queue, and are shed with `Overloaded` if the
+queue is full or they wait too long, so a burst of expensive queries fails fast
+rather than piling up on the cluster.
+"""
+
+import asyncio
+import contextlib
+from collections import deque
+from typing import AsyncIterator
+
+
+class Overloaded(Exception):
+    """Raised when a search is shed because too many are already in flight."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Search shed: {reason}")
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    Cap on concurrent searches with a bounded wait queue.
+
+    Must only be used from the event loop: state isn't locked, and queued searches
+    wait on futures of the loop they were queued from. Requests which send several
+    searches at once take a slot for each, up to `max_in_flight`, and queue in order
+    with the others.
+
+    :param int max_in_flight: most searches in flight at once
+    :param int max_queued: most requests waiting for slots at once
+    :param float queue_timeout: longest time in seconds a request waits for slots
+    """
+
+    def __init__(self, max_in_flight: int, max_queued: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = {"queue_full": 0, "queue_timeout": 0}
+        self._waiters: deque[tuple[asyncio.Future, int]] = deque()
+
+    @property
+    def queued(self) -> int:
+        """Number of requests waiting for slots."""
+        return len(self._waiters)
+
+    def slots_for(self, searches: int) -> int:
+        """Get the number of slots taken by a request sending `searches` at once."""
+        return max(1, min(searches, self.max_in_flight))
+
+    async def acquire(self, searches: int = 1) -> None:
+        """
+        Wait for slots to send searches.
+
+        :param int searches: number of searches sent at once, e.g. in an _msearch
+        :raises Overloaded: if the queue is full, or the slots aren't free within the
+            queue timeout
+        """
+        slots = self.slots_for(searches)
+
+        if self.in_flight + slots <= self.max_in_flight and not self._waiters:
+            self.in_flight += slots
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queued:
+            self.shed["queue_full"] += 1
+            raise Overloaded("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((waiter, slots))
+
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # Slots may have been handed over just as the wait ended
+            if waiter.done() and not waiter.cancelled():
+                self.release(searches)
+
+            if isinstance(e, asyncio.TimeoutError):
+                self.shed["queue_timeout"] += 1
+                raise Overloaded("queue_timeout") from e
+
+            raise
+        finally:
+            if (waiter, slots) in self._waiters:
+                self._waiters.remove((waiter, slots))
+                # Requests queued behind this one may fit in the free slots
+                self.hand_over()
+
+        self.admitted += 1
+
+    def release(self, searches: int = 1) -> None:
+        """Free the slots taken by `acquire`, handing them to queued requests in turn."""
+        self.in_flight -= self.slots_for(searches)
+        self.hand_over()
+
+    def hand_over(self) -> None:
+        """Give free slots to queued requests, in the order they were queued."""
+        while self._waiters:
+            waiter, slots = self._waiters[0]
+
+            if waiter.done():
+                self._waiters.popleft()
+                continue
+
+            if self.in_flight + slots > self.max_in_flight:
+                return
+
+            self._waiters.popleft()
+            self.in_flight += slots
+            waiter.set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, searches: int = 1) -> AsyncIterator[None]:
+        """Hold slots for `searches` for the duration of a `async with` block."""
+        await self.acquire(searches)
+
+        try:
+            yield
+        finally:
+            self.release(searches)
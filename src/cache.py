@@ -0,0 +1,265 @@
+import asyncio
+import multiprocessing
+import os
+import time
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Hashable, Optional, TypeVar
+
+import orjson
+
+T = TypeVar("T")
+
+
+def json_size(value: Any) -> int:
+    """
+    Estimate the in-memory size of a JSON-serialisable value by its serialised length in bytes.
+
+    Serialised with orjson, as responses are, since sizing every cached search
+    response with the standard library encoder costs several times more than
+    rendering it.
+    """
+    return len(orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS))
+
+
+class LRUCache:
+    """
+    Least-recently-used cache whose entries expire after a time-to-live.
+
+    The cache is bounded by both its number of entries and the total size of its
+    values in bytes, so a few very large values can't use up all of the memory.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        ttl: float,
+        sizeof: Callable[[Any], int] = json_size,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+
+        # key -> (value, size in bytes, expiry time)
+        self._entries: OrderedDict[Hashable, tuple[Any, int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        """Get the number of entries in the cache."""
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a value from the cache, or None if it's missing or has expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, _, expires_at = entry
+
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Add a value to the cache, evicting the least recently used values to make space."""
+        size = self.sizeof(value)
+
+        # Values bigger than the whole cache are never stored
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self.current_bytes += size
+
+            while (
+                len(self._entries) > self.max_entries
+                or self.current_bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all values from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        """Get hit, miss and eviction counts, and the current size of the cache."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+        }
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+
+class SingleFlight:
+    """
+    Share one in-flight call between concurrent callers with the same key.
+
+    The first caller for a key starts the call as a task. Callers with the same key
+    that arrive before it finishes wait for the same task rather than starting
+    another, and all of them get its result or exception. A caller being cancelled
+    doesn't cancel the call for the others.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """Call `func`, or wait for the in-flight call with the same key if there is one."""
+        task = self._in_flight.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+
+class DiskCache:
+    """
+    Cache of strings stored as files in a directory, which can be shared between processes and runs.
+
+    Keys are used as file names, so should be hex digests of what the value is made
+    from. Files are written to a temporary name and then renamed, so processes using
+    the same directory never read half-written values.
+
+    The cache is bounded by the total size of its files. `evict` removes the least
+    recently used files to get under the bound, where use is tracked by updating a
+    file's modification time on each hit.
+
+    Hit and miss counts are kept in shared memory, so they include the hits and misses
+    of child processes given this cache, e.g. as a process pool initializer argument.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._hits = multiprocessing.Value("Q", 0)
+        self._misses = multiprocessing.Value("Q", 0)
+        self.evictions = 0
+
+    @property
+    def hits(self) -> int:
+        """Get the number of hits, in this process and its children."""
+        return self._hits.value
+
+    @property
+    def misses(self) -> int:
+        """Get the number of misses, in this process and its children."""
+        return self._misses.value
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a value from the cache, or None if it's missing."""
+        path = self._path(key)
+
+        try:
+            value = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except FileNotFoundError:
+            with self._misses.get_lock():
+                self._misses.value += 1
+            return None
+
+        with self._hits.get_lock():
+            self._hits.value += 1
+
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Add a value to the cache. The cache can go over its size until `evict` is called."""
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temp_path.write_text(value, encoding="utf-8")
+        os.replace(temp_path, path)
+
+    def evict(self) -> int:
+        """
+        Remove the least recently used values until the cache is within its size.
+
+        :return int: number of values removed
+        """
+        files = []
+
+        for path in self.directory.glob("*/*"):
+            if path.suffix == ".tmp":
+                continue
+
+            stat = path.stat()
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        current_bytes = sum(size for _, size, _ in files)
+        evicted = 0
+
+        for _, size, path in sorted(files):
+            if current_bytes <= self.max_bytes:
+                break
+
+            path.unlink(missing_ok=True)
+            current_bytes -= size
+            evicted += 1
+
+        self.evictions += evicted
+
+        return evicted
+
+    def stats(self) -> dict[str, float]:
+        """Get hit and miss counts, the hit rate and the number of values evicted."""
+        lookups = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def _path(self, key: str) -> Path:
+        # Files are spread over subdirectories, as some filesystems slow down with
+        # many files in one directory
+        return self.directory / key[:2] / key
@@ -0,0 +1,211 @@
+"""
+Response compression with gzip or brotli, whichever the client prefers.
+
+Based on Starlette's `GZipMiddleware`, which only supports gzip. Brotli is used if the
+`brotli` package is installed. Responses smaller than `minimum_size` aren't
+compressed, as the saving doesn't cover the cost. Streaming responses are compressed
+chunk by chunk, and each chunk is flushed so clients can decode it straight away.
+"""
+
+import zlib
+from typing import Optional, Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+GZIP_LEVEL = 6
+# Quality 11 is brotli's default, and far too slow for dynamic responses
+BROTLI_QUALITY = 5
+
+
+class Compressor(Protocol):
+    """Incremental compressor for one response body."""
+
+    encoding: str
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk of the body, and return everything that can be sent so far."""
+
+    def finish(self) -> bytes:
+        """Return the end of the compressed body."""
+
+
+class GzipCompressor:
+    """Incremental gzip compressor."""
+
+    encoding = "gzip"
+
+    def __init__(self, level: int = GZIP_LEVEL):
+        # wbits=31 writes a gzip header and trailer rather than raw zlib
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk of the body, and return everything that can be sent so far."""
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        """Return the end of the compressed body."""
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    """Incremental brotli compressor."""
+
+    encoding = "br"
+
+    def __init__(self, quality: int = BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk of the body, and return everything that can be sent so far."""
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        """Return the end of the compressed body."""
+        return self._compressor.finish()
+
+
+COMPRESSORS = {"gzip": GzipCompressor}
+if brotli is not None:
+    COMPRESSORS["br"] = BrotliCompressor
+
+# Preferred encoding when the client accepts several equally
+ENCODING_PREFERENCE = ["br", "gzip"]
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Choose a supported content encoding from an Accept-Encoding header.
+
+    :param str accept_encoding: Accept-Encoding header, e.g. "gzip;q=0.8, br"
+    :return Optional[str]: the encoding with the highest quality value, or None if
+        none are supported
+    """
+    qualities = {}
+
+    for part in accept_encoding.split(","):
+        encoding, _, params = part.strip().partition(";")
+        quality = 1.0
+
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+
+        qualities[encoding.strip().lower()] = quality
+
+    candidates = [
+        (quality, -ENCODING_PREFERENCE.index(encoding), encoding)
+        for encoding, quality in qualities.items()
+        if encoding in COMPRESSORS and quality > 0
+    ]
+
+    return max(candidates)[2] if candidates else None
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware which compresses response bodies of at least `minimum_size` bytes.
+
+    :param ASGIApp app: app to wrap
+    :param int minimum_size: smallest response body to compress, in bytes
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle a request, compressing the response if the client accepts it."""
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            encoding = negotiate_encoding(headers.get("Accept-Encoding", ""))
+
+            if encoding is not None:
+                responder = CompressionResponder(
+                    self.app, self.minimum_size, COMPRESSORS[encoding]()
+                )
+                await responder(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
+
+
+class CompressionResponder:
+    """Sends one response, compressing its body once the first chunk shows it's worth it."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int, compressor: Compressor):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compressor = compressor
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.compressing = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Run the app, compressing the messages it sends."""
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        """Hold back the response start until the first body chunk, then compress the body if needed."""
+        if message["type"] == "http.response.start":
+            # Headers can't be sent until it's known whether the body is compressed
+            self.initial_message = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.started and not self.compressing:
+            await self.send(message)
+            return
+
+        if self.started:
+            body = self.compressor.compress(body)
+            if not more_body:
+                body += self.compressor.finish()
+
+            await self.send(
+                {"type": "http.response.body", "body": body, "more_body": more_body}
+            )
+            return
+
+        self.started = True
+        headers = MutableHeaders(raw=self.initial_message["headers"])
+        self.compressing = "content-encoding" not in headers and (
+            more_body or len(body) >= self.minimum_size
+        )
+
+        if not self.compressing:
+            await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        body = self.compressor.compress(body)
+        headers["Content-Encoding"] = self.compressor.encoding
+        headers.add_vary_header("Accept-Encoding")
+
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            body += self.compressor.finish()
+            headers["Content-Length"] = str(len(body))
+
+        await self.send(self.initial_message)
+        await self.send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
@@ -1,3 +1,5 @@
+import os
+
 from dotenv import load_dotenv, find_dotenv
 
 load_dotenv(find_dotenv())
@@ -30,3 +32,95 @@ FULL_PASSAGE_CONCEPTS: set[str] = {
 }  # Concepts which annoatate each full passage rather than a span within it
 PARTIAL_PASSAGE_CONCEPTS_TO_INDEX: set[str] = CONCEPTS_TO_INDEX - FULL_PASSAGE_CONCEPTS
 FULL_PASSAGE_CONCEPTS_TO_INDEX: set[str] = CONCEPTS_TO_INDEX & FULL_PASSAGE_CONCEPTS
+
+# OpenSearch client settings for the API. The client is created once per process and
+# shared between requests, so the pool size bounds how many requests can be in flight
+# to the cluster at any one time.
+OPENSEARCH_POOL_MAXSIZE: int = int(os.getenv("OPENSEARCH_POOL_MAXSIZE", 32))
+OPENSEARCH_TIMEOUT: float = float(os.getenv("OPENSEARCH_TIMEOUT", 10))
+OPENSEARCH_KEEPALIVE_IDLE: int = int(os.getenv("OPENSEARCH_KEEPALIVE_IDLE", 60))
+
+# Responses at least this many bytes long are compressed with brotli or gzip, if the
+# client accepts either
+RESPONSE_COMPRESSION_MIN_SIZE: int = int(
+    os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", 1024)
+)
+
+# Aliases (e.g. global-stocktake-docs) are resolved to concrete index names at most
+# this often, so a repointed alias is picked up by the API within this many seconds.
+INDEX_ALIAS_TTL: float = float(os.getenv("INDEX_ALIAS_TTL", 10))
+
+# In-memory cache of /search results
+SEARCH_CACHE_MAX_ENTRIES: int = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 1024))
+SEARCH_CACHE_MAX_BYTES: int = int(os.getenv("SEARCH_CACHE_MAX_BYTES", 64 * 1024**2))
+SEARCH_CACHE_TTL: float = float(os.getenv("SEARCH_CACHE_TTL", 300))
+
+# How long browsers and the CDN can use /searchFilters responses before revalidating
+SEARCH_FILTERS_MAX_AGE: int = int(os.getenv("SEARCH_FILTERS_MAX_AGE", 300))
+
+# How long a point in time used for cursor-based pagination on /search is kept open
+# after each page is fetched.
+SEARCH_PIT_KEEP_ALIVE: str = os.getenv("SEARCH_PIT_KEEP_ALIVE", "5m")
+
+# Admission control for searches. Each API process sends at most
+# SEARCH_MAX_IN_FLIGHT searches to the cluster at once. Others wait in a queue of at
+# most SEARCH_MAX_QUEUED for up to SEARCH_QUEUE_TIMEOUT seconds, and are otherwise
+# rejected with a 503 telling the client to retry after SEARCH_RETRY_AFTER seconds.
+SEARCH_MAX_IN_FLIGHT: int = int(
+    os.getenv("SEARCH_MAX_IN_FLIGHT", OPENSEARCH_POOL_MAXSIZE)
+)
+SEARCH_MAX_QUEUED: int = int(os.getenv("SEARCH_MAX_QUEUED", 64))
+SEARCH_QUEUE_TIMEOUT: float = float(os.getenv("SEARCH_QUEUE_TIMEOUT", 2))
+SEARCH_RETRY_AFTER: int = int(os.getenv("SEARCH_RETRY_AFTER", 1))
+
+# Server-side time limit for each search, after which OpenSearch returns the hits it
+# has collected so far. Kept below OPENSEARCH_TIMEOUT so that partial results come
+# back before the client gives up.
+SEARCH_TIMEOUT: str = os.getenv("SEARCH_TIMEOUT", "5s")
+
+# Most documents each shard collects for a text search before returning early. 0 means
+# no limit. Early termination makes relevance ranking and hit counts approximate.
+SEARCH_TERMINATE_AFTER: int = int(os.getenv("SEARCH_TERMINATE_AFTER", 0))
+
+# Whether the search index was built with `index_data.py --sort-by-date`. If so,
+# searches sorted newest first use the same sort as the index and count at most
+# SEARCH_SORTED_TRACK_TOTAL_HITS matches, so shards can stop early rather than
+# collecting every match.
+SEARCH_INDEX_SORTED_BY_DATE: bool = (
+    os.getenv("SEARCH_INDEX_SORTED_BY_DATE", "false").lower() == "true"
+)
+SEARCH_SORTED_TRACK_TOTAL_HITS: int = int(
+    os.getenv("SEARCH_SORTED_TRACK_TOTAL_HITS", 1000)
+)
+
+# Whether the search index was built with `index_data.py --normalise-documents`. If
+# so, document metadata is added to search results from the documents index.
+SEARCH_NORMALISED_DOCUMENTS: bool = (
+    os.getenv("SEARCH_NORMALISED_DOCUMENTS", "false").lower() == "true"
+)
+
+# Largest page size which can be requested from /search
+SEARCH_MAX_LIMIT: int = int(os.getenv("SEARCH_MAX_LIMIT", 100))
+
+# Furthest offset + limit which can be requested with offset pagination. Should be no
+# more than the search index's `index.max_result_window` setting, which OpenSearch
+# rejects searches past.
+SEARCH_MAX_RESULT_WINDOW: int = int(os.getenv("SEARCH_MAX_RESULT_WINDOW", 10000))
+
+# Most searches which can be sent in one request to /search/batch
+SEARCH_BATCH_MAX_SIZE: int = int(os.getenv("SEARCH_BATCH_MAX_SIZE", 20))
+
+# Number of hits fetched from OpenSearch at a time by /search/export
+SEARCH_EXPORT_PAGE_SIZE: int = int(os.getenv("SEARCH_EXPORT_PAGE_SIZE", 500))
+
+# Most passages which can be returned for each document when grouping /search results
+# by document
+SEARCH_MAX_PASSAGES_PER_DOCUMENT: int = int(
+    os.getenv("SEARCH_MAX_PASSAGES_PER_DOCUMENT", 10)
+)
+
+# The alias the UI searches. /health checks that it and its metadata alias resolve to
+# indices with documents in, and the filters for it are loaded before the API reports
+# that it's ready.
+SEARCH_INDEX_ALIAS: str = os.getenv("SEARCH_INDEX_ALIAS", "global-stocktake-docs")
+HEALTH_CHECK_INTERVAL: float = float(os.getenv("HEALTH_CHECK_INTERVAL", 15))
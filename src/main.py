@@ -1,156 +1,708 @@
-from typing import Sequence, Optional, Literal
-import itertools
-import datetime
+from typing import Any, Callable, Literal, Optional
+import asyncio
+import hashlib
+import json
 import logging
-
-from fastapi import FastAPI, Depends
-from pydantic import BaseModel
+import time
+
+from fastapi import FastAPI, Depends, Header, HTTPException, Request
+from fastapi.responses import (
+    JSONResponse,
+    ORJSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 from dotenv import load_dotenv, find_dotenv
-from src.opensearch.client import get_opensearch_client
+from opensearchpy import OpenSearch
+from opensearchpy.exceptions import NotFoundError
+from src.opensearch.client import (
+    get_opensearch_client,
+    close_opensearch_client,
+    run_in_executor,
+)
+from src.opensearch.aliases import IndexResolver
+from src.opensearch.health import HealthMonitor
+from src.opensearch.query import (
+    SearchRequest,
+    build_search_query,
+    canonical_search_request,
+    encode_cursor,
+    decode_cursor,
+)
+from src.opensearch.documents import DOCUMENTS_INDEX_SUFFIX, hydrate_documents
+from src.opensearch.export import export_search_results
+from src.opensearch.highlight import add_html_highlight
+from src.opensearch.neighbours import add_neighbours
+from src.opensearch.response import (
+    compact_search_response,
+    format_facets,
+    inner_hits,
+)
+from src.admission import AdmissionController, Overloaded
+from src.cache import LRUCache, SingleFlight
+from src.compression import CompressionMiddleware
+from src import config, metrics
 
 app = FastAPI()
+app.add_middleware(
+    CompressionMiddleware, minimum_size=config.RESPONSE_COMPRESSION_MIN_SIZE
+)
 
 load_dotenv(find_dotenv())
 logging.basicConfig(level=logging.INFO)
 
 LOGGER = logging.getLogger(__name__)
 
+index_resolver = IndexResolver(ttl=config.INDEX_ALIAS_TTL)
+
+# Search results are cached by request and the concrete index the request resolved
+# to, so results from an index an alias no longer points to are never returned.
+search_cache = LRUCache(
+    max_entries=config.SEARCH_CACHE_MAX_ENTRIES,
+    max_bytes=config.SEARCH_CACHE_MAX_BYTES,
+    ttl=config.SEARCH_CACHE_TTL,
+)
+index_resolver.on_change(lambda alias, index: search_cache.clear())
+
+# Search filters only change when a new index is built, so they're kept for each
+# concrete metadata index: concrete index name -> (filters, ETag)
+search_filters_cache: dict[str, tuple[dict, str]] = {}
+index_resolver.on_change(lambda alias, index: search_filters_cache.clear())
+
+# Identical searches which arrive while one is already in flight share its result
+search_flights = SingleFlight()
+
+# Bounds how many searches this process sends to the cluster at once
+search_admission = AdmissionController(
+    max_in_flight=config.SEARCH_MAX_IN_FLIGHT,
+    max_queued=config.SEARCH_MAX_QUEUED,
+    queue_timeout=config.SEARCH_QUEUE_TIMEOUT,
+)
+
+metrics.REGISTRY.register(
+    metrics.CallbackMetric(
+        "search_shed_requests_total",
+        "Searches rejected because the admission queue was full or they waited too long.",
+        "counter",
+        ["reason"],
+        lambda: {(reason,): count for reason, count in search_admission.shed.items()},
+    )
+)
+metrics.REGISTRY.register(
+    metrics.CallbackMetric(
+        "search_admission_requests",
+        "Searches currently in flight to OpenSearch and waiting in the admission queue.",
+        "gauge",
+        ["state"],
+        lambda: {
+            ("in_flight",): search_admission.in_flight,
+            ("queued",): search_admission.queued,
+        },
+    )
+)
+metrics.REGISTRY.register(
+    metrics.CallbackMetric(
+        "search_single_flight_total",
+        "Searches which called OpenSearch, and searches which shared an identical in-flight call.",
+        "counter",
+        ["result"],
+        lambda: {
+            ("executed",): search_flights.calls,
+            ("coalesced",): search_flights.coalesced,
+        },
+    )
+)
+metrics.REGISTRY.register(
+    metrics.CallbackMetric(
+        "search_cache_events_total",
+        "Search result cache hits, misses, evictions and expirations.",
+        "counter",
+        ["event"],
+        lambda: {
+            (event,): search_cache.stats()[event]
+            for event in ("hits", "misses", "evictions", "expirations")
+        },
+    )
+)
+metrics.REGISTRY.register(
+    metrics.CallbackMetric(
+        "search_cache_size",
+        "Number of entries and bytes in the search result cache.",
+        "gauge",
+        ["unit"],
+        lambda: {(unit,): search_cache.stats()[unit] for unit in ("entries", "bytes")},
+    )
+)
+
+
+@app.on_event("startup")
+async def start_opensearch_client():
+    """
+    Create the OpenSearch client shared by all requests, and start checking its health in the background.
+
+    Dependency overrides are respected so that tests can swap in a fake client.
+    """
+    get_client = app.dependency_overrides.get(
+        get_opensearch_client, get_opensearch_client
+    )
+    opns = get_client()
+
+    app.state.ready = False
+    app.state.health = HealthMonitor(
+        opns,
+        aliases=[config.SEARCH_INDEX_ALIAS, config.SEARCH_INDEX_ALIAS + "-metadata"],
+        interval=config.HEALTH_CHECK_INTERVAL,
+    )
+    app.state.health_task = asyncio.create_task(warm_up_and_monitor_health(opns))
+
+
+async def warm_up_and_monitor_health(opns: OpenSearch):
+    """
+    Check health periodically, and load the search filters into their cache then mark the API as ready.
+
+    Both keep retrying while the cluster is unreachable, so the process stays live but
+    not ready until the cluster is healthy and the filters are loaded.
+    """
+    health_checks = asyncio.create_task(app.state.health.run())
+
+    try:
+        while not app.state.ready:
+            try:
+                await get_cached_search_filters(opns, config.SEARCH_INDEX_ALIAS)
+                app.state.ready = True
+            except Exception as e:
+                LOGGER.warning(f"Failed to load search filters during warm-up: {e}")
+                await asyncio.sleep(config.HEALTH_CHECK_INTERVAL)
+
+        await health_checks
+    finally:
+        health_checks.cancel()
+
+
+@app.on_event("shutdown")
+async def stop_opensearch_client():
+    """Stop the health checks and close the shared client's connections."""
+    app.state.health_task.cancel()
+    close_opensearch_client()
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record the count, duration and response size of each request, by route."""
+    start = time.perf_counter()
+    response = await call_next(request)
+    duration = time.perf_counter() - start
+
+    # Use the route's path template rather than the URL, so that each route is one label
+    route = request.scope.get("route")
+    route_path = route.path if route is not None else "unmatched"
+
+    metrics.HTTP_REQUESTS.inc(
+        method=request.method, route=route_path, status=str(response.status_code)
+    )
+    metrics.HTTP_REQUEST_DURATION.observe(
+        duration, method=request.method, route=route_path
+    )
+
+    if "content-length" in response.headers:
+        metrics.HTTP_RESPONSE_SIZE.observe(
+            int(response.headers["content-length"]), route=route_path
+        )
+
+    return response
+
+
+@app.exception_handler(Overloaded)
+async def handle_overloaded(request: Request, exc: Overloaded):
+    """Reject a shed search with a 503, telling the client when to retry."""
+    return JSONResponse(
+        {"detail": "Too many searches in progress, please retry"},
+        status_code=503,
+        headers={"Retry-After": str(config.SEARCH_RETRY_AFTER)},
+    )
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Get metrics for this process in the Prometheus text format."""
+    return PlainTextResponse(
+        metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
+
 
 @app.get("/health")
 async def get_health():
     """
-    Get application health.
+    Get application health from the latest background check of OpenSearch.
 
-    TODO: fill in implementation with real health check.
+    This doesn't call OpenSearch, so is cheap enough to be polled by load balancers.
+    Returns 503 if any check failed or none have run yet.
     """
+    health = getattr(app.state, "health", None)
+
+    if health is None:
+        return JSONResponse({"status": "UNKNOWN"}, status_code=503)
+
+    return JSONResponse(health.report, status_code=200 if health.is_healthy else 503)
+
+
+@app.get("/health/live")
+async def get_liveness():
+    """Get whether the API process is running and able to handle requests."""
     return {"status": "OK"}
 
 
-class SearchRequest(BaseModel):
-    """Request body for search endpoint."""
+@app.get("/health/ready")
+async def get_readiness():
+    """
+    Get whether the API is ready to take traffic.
 
-    text: str
-    span_types: Sequence[str] = []
-    is_party: Optional[bool] = None
-    index: str = "global-stocktake"
-    limit: int = 10
-    offset: int = 0
-    date_from: Optional[datetime.date] = None
-    date_to: Optional[datetime.date] = None
-    authors: Optional[Sequence[str]] = None
-    types: Optional[Sequence[str]] = None
-    sort_field: Optional[Literal["date", "relevance"]] = None
-    sort_order: Optional[Literal["asc", "desc"]] = None
+    The API is ready once its OpenSearch client is created, the search filters are
+    cached, and the latest health check passed.
+    """
+    health = getattr(app.state, "health", None)
+    ready = (
+        getattr(app.state, "ready", False) and health is not None and health.is_healthy
+    )
 
+    return JSONResponse(
+        {"status": "OK" if ready else "NOT_READY"}, status_code=200 if ready else 503
+    )
 
-@app.post("/search")
-async def search(request: SearchRequest, opns=Depends(get_opensearch_client)):
-    """Get search results."""
 
-    # Basic query body
-    query_body = {
-        "from": request.offset,
-        "size": request.limit,
-        "query": {
-            "bool": {
-                "must": [],
-            }
-        },
+async def timed_search(route: str, func: Callable[..., dict], **kwargs: Any) -> dict:
+    """Run a search or msearch, recording its client round-trip time and the time OpenSearch reports it took."""
+    start = time.perf_counter()
+    opns_result = await run_in_executor(func, **kwargs)
+    metrics.OPENSEARCH_ROUND_TRIP.observe(time.perf_counter() - start, route=route)
+
+    if "took" in opns_result:
+        metrics.OPENSEARCH_TOOK.observe(opns_result["took"] / 1000, route=route)
+
+    return opns_result
+
+
+def json_response(content: Any, route: str, **kwargs: Any) -> Response:
+    """
+    Serialise content to a JSON response with orjson, recording how long it takes.
+
+    Content must already be JSON-compatible: it isn't passed through FastAPI's
+    `jsonable_encoder`. Search responses are large, and orjson serialises them several
+    times faster than the standard library.
+    """
+    start = time.perf_counter()
+    response = ORJSONResponse(content=content, **kwargs)
+    metrics.RESPONSE_SERIALISATION.observe(time.perf_counter() - start, route=route)
+
+    return response
+
+
+def record_search_request(request: SearchRequest) -> None:
+    """Count which filters and sort a search request used."""
+    used_filters = {
+        "text": bool(request.text),
+        "span_types": bool(request.span_types),
+        "is_party": request.is_party is not None,
+        "dates": bool(request.date_from or request.date_to),
+        "authors": bool(request.authors),
+        "types": bool(request.types),
     }
 
-    # Text search
-    if request.text:
-        query_body["query"]["bool"]["must"].append(
-            {"match": {"text_html": {"query": request.text, "operator": "and"}}}
+    for name, used in used_filters.items():
+        if used:
+            metrics.SEARCH_FILTERS_USED.inc(filter=name)
+
+    if request.sort_field == "date":
+        sort = f"date_{request.sort_order or 'desc'}"
+    else:
+        sort = "relevance"
+
+    metrics.SEARCH_SORTS_USED.inc(sort=sort)
+
+
+async def add_hit_context(
+    opns: OpenSearch, request: SearchRequest, index: str, opns_result: dict
+) -> None:
+    """
+    Add data which isn't stored in each passage to search results.
+
+    Document metadata is added from the documents index if
+    `config.SEARCH_NORMALISED_DOCUMENTS` is set, and neighbouring blocks' text is
+    added if the request asks for neighbours and the index doesn't store it.
+
+    :param OpenSearch opns: OpenSearch client
+    :param SearchRequest request: search request
+    :param str index: concrete index name(s) the request resolved to
+    :param dict opns_result: OpenSearch response, which is changed in place
+    """
+    hits = opns_result["hits"]["hits"]
+    lookups = []
+
+    if config.SEARCH_NORMALISED_DOCUMENTS:
+        documents_index = await index_resolver.resolve(
+            opns, request.index + DOCUMENTS_INDEX_SUFFIX
+        )
+        lookups.append(
+            hydrate_documents(
+                opns,
+                documents_index,
+                hits,
+                fields=request.fields,
+                exclude_fields=request.exclude_fields,
+            )
         )
 
-        query_body["highlight"] = {
-            "number_of_fragments": 0,
-            "fields": {
-                "text_html": {
-                    "pre_tags": [
-                        '<mark class="search-highlight" style="background: #fbec5d; padding: 0.45em 0.6em; margin: 0 0.25em; line-height: 1; border-radius: 0.35em;">'
-                    ],
-                    "post_tags": ["</mark>"],
-                },
-            },
-        }
+    if request.neighbours:
+        lookups.append(add_neighbours(opns, index, hits))
 
-    else:
-        query_body["query"]["bool"]["must"].append({"match_all": {}})
+    await asyncio.gather(*lookups)
 
-    # Filters (span types, is_party, date, authors, types)
-    query_body["query"]["bool"].update({"filter": []})
 
-    if request.span_types:
-        # Create an OR filter for types within the same concept, and an AND filter between concepts.
-        # E.g. (Fossil fuels - Coal OR Fossil fuels - Oil) AND (Energy - Electricity)
-        types_with_concepts = sorted(
-            [(type.split("–")[0].strip(), type) for type in request.span_types]
+def offset_pagination_error(request: SearchRequest) -> Optional[str]:
+    """Get an error for an offset paginated search past `SEARCH_MAX_RESULT_WINDOW`, which OpenSearch would reject."""
+    if request.offset + request.limit > config.SEARCH_MAX_RESULT_WINDOW:
+        return (
+            f"offset + limit can be at most {config.SEARCH_MAX_RESULT_WINDOW}. "
+            'Use "pagination": "cursor" to page further through results'
         )
 
-        for _, types_with_concepts_group in itertools.groupby(
-            types_with_concepts, lambda x: x[0]
-        ):
-            types = [type[1] for type in types_with_concepts_group]
-            query_body["query"]["bool"]["filter"].append(
-                {"terms": {"span_types": types}}
-            )
+    return None
+
+
+def is_complete(opns_result: dict) -> bool:
+    """Check that a search wasn't cut short by its timeout or terminate_after, so its results can be cached."""
+    return not (opns_result.get("timed_out") or opns_result.get("terminated_early"))
 
-    if request.is_party is not None:
-        query_body["query"]["bool"]["filter"].append(
-            {"term": {"is_party": request.is_party}}
+
+def format_search_response(request: SearchRequest, opns_result: dict) -> dict:
+    """
+    Format an OpenSearch response to return from the API.
+
+    Facet counts are added under `facets`, and the number of matching documents under
+    `total_documents` for results grouped by document. Matches highlighted in `text`
+    are mapped onto `text_html` by `add_html_highlight`, which also fills in the
+    unhighlighted HTML if no text was searched, as Opensearch doesn't populate the
+    highlight in that case. Compact responses are built with `compact_search_response`.
+
+    Mapping highlights onto long passages' HTML takes a while, so this is run with
+    `run_in_executor` rather than on the event loop.
+    """
+    aggregations = opns_result.get("aggregations", {})
+
+    if request.facets:
+        opns_result["facets"] = format_facets(aggregations)
+
+    if "document_count" in aggregations:
+        # Counted within a filter aggregation when facet selections are post filters
+        document_count = aggregations["document_count"]
+        opns_result["total_documents"] = document_count.get(
+            "documents", document_count
+        )["value"]
+
+    for item in opns_result["hits"]["hits"]:
+        for hit in [item] + inner_hits(item):
+            add_html_highlight(hit)
+
+    if request.compact:
+        return compact_search_response(opns_result)
+
+    return opns_result
+
+
+async def search_with_cursor(
+    opns: OpenSearch, request: SearchRequest, index: str
+) -> dict:
+    """
+    Get a page of search results using a point in time and search_after.
+
+    A point in time is created on the first page. Every page's response contains a
+    cursor to pass in the request for the next page, which is None on the last page.
+    """
+    if request.cursor:
+        try:
+            pit_id, search_after = decode_cursor(request.cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    else:
+        pit = await run_in_executor(
+            opns.create_point_in_time,
+            index=index,
+            keep_alive=config.SEARCH_PIT_KEEP_ALIVE,
         )
+        pit_id, search_after = pit["pit_id"], None
+
+    query_body = build_search_query(request, pit_id=pit_id, search_after=search_after)
 
-    if request.date_from or request.date_to:
-        query_body["query"]["bool"]["filter"].append(
-            {"range": {"document_metadata.date": {}}}
+    try:
+        opns_result = await timed_search("/search", opns.search, body=query_body)
+    except NotFoundError:
+        if request.cursor:
+            raise HTTPException(status_code=410, detail="Cursor has expired")
+        raise
+
+    await add_hit_context(opns, request, index, opns_result)
+
+    pit_id = opns_result.get("pit_id", pit_id)
+    hits = opns_result["hits"]["hits"]
+
+    # A page cut short by a cluster-wide search timeout isn't the last one, so it
+    # continues from its last hit, or is retried from the same place if it has none
+    if len(hits) == request.limit or opns_result.get("timed_out"):
+        last_sort = hits[-1]["sort"] if hits else search_after
+        opns_result["cursor"] = encode_cursor(pit_id, last_sort)
+    else:
+        opns_result["cursor"] = None
+        await run_in_executor(
+            opns.delete_point_in_time, body={"pit_id": [pit_id]}, ignore=404
         )
 
-        if request.date_from:
-            query_body["query"]["bool"]["filter"][-1]["range"][
-                "document_metadata.date"
-            ]["gte"] = request.date_from.strftime("%Y-%m-%d")
+    return await run_in_executor(format_search_response, request, opns_result)
+
+
+@app.post("/search")
+async def search(request: SearchRequest, opns=Depends(get_opensearch_client)):
+    """Get search results."""
+
+    record_search_request(request)
+    index = await index_resolver.resolve(opns, request.index)
+
+    # Cursors point to a specific point in time, so pages from them aren't cached
+    if request.pagination == "cursor" or request.cursor:
+        if request.group_by_document:
+            raise HTTPException(
+                status_code=400,
+                detail="Cursor pagination can't be used when grouping by document",
+            )
+
+        # An empty page can't end or advance the cursor
+        if request.limit < 1:
+            raise HTTPException(
+                status_code=400, detail="Cursor pagination needs a limit of at least 1"
+            )
+
+        async with search_admission.slot():
+            search_response = await search_with_cursor(opns, request, index)
+
+        return json_response(search_response, route="/search")
+
+    pagination_error = offset_pagination_error(request)
+    if pagination_error:
+        raise HTTPException(status_code=400, detail=pagination_error)
+
+    cache_key = canonical_search_request(request, index)
+
+    cached_result = search_cache.get(cache_key)
+    if cached_result is not None:
+        return json_response(cached_result, route="/search")
 
-        if request.date_to:
-            query_body["query"]["bool"]["filter"][-1]["range"][
-                "document_metadata.date"
-            ]["lte"] = request.date_to.strftime("%Y-%m-%d")
+    async def execute_search() -> dict:
+        query_body = build_search_query(request)
 
-    if request.authors:
-        query_body["query"]["bool"]["filter"].append(
-            {"terms": {"document_metadata.author": request.authors}}
+        async with search_admission.slot():
+            opns_result = await timed_search(
+                "/search", opns.search, index=index, body=query_body
+            )
+            await add_hit_context(opns, request, index, opns_result)
+
+        search_response = await run_in_executor(
+            format_search_response, request, opns_result
         )
 
-    if request.types:
-        query_body["query"]["bool"]["filter"].append(
-            {"terms": {"document_metadata.types": request.types}}
+        if is_complete(opns_result):
+            search_cache.set(cache_key, search_response)
+
+        return search_response
+
+    search_response = await search_flights.do(cache_key, execute_search)
+
+    return json_response(search_response, route="/search")
+
+
+@app.post("/search/batch")
+async def search_batch(
+    requests: list[SearchRequest], opns=Depends(get_opensearch_client)
+):
+    """
+    Get results for several searches in one OpenSearch _msearch call.
+
+    Results are returned in the same order as the requests. Each one has a status, and
+    either a `result` in the same format as /search or an `error`.
+    """
+    if len(requests) > config.SEARCH_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {config.SEARCH_BATCH_MAX_SIZE} searches can be batched",
         )
 
-    # Sort
-    if request.sort_field == "relevance" and request.sort_order == "asc":
-        LOGGER.warning(
-            "Ascending relevance sort is not supported. Defaulting to descending."
+    results: list[Optional[dict]] = [None] * len(requests)
+    uncached_requests: list[tuple[int, SearchRequest, str, str]] = []
+    msearch_body: list[dict] = []
+
+    for position, request in enumerate(requests):
+        record_search_request(request)
+
+        if request.pagination == "cursor" or request.cursor:
+            results[position] = {
+                "status": 400,
+                "error": "Cursor pagination isn't supported in batch searches",
+            }
+            continue
+
+        pagination_error = offset_pagination_error(request)
+        if pagination_error:
+            results[position] = {"status": 400, "error": pagination_error}
+            continue
+
+        index = await index_resolver.resolve(opns, request.index)
+        cache_key = canonical_search_request(request, index)
+
+        cached_result = search_cache.get(cache_key)
+        if cached_result is not None:
+            results[position] = {"status": 200, "result": cached_result}
+            continue
+
+        uncached_requests.append((position, request, index, cache_key))
+        msearch_body.extend([{"index": index}, build_search_query(request)])
+
+    if msearch_body:
+        # The cluster runs a batch's searches concurrently, so it takes a slot for each
+        async with search_admission.slot(len(uncached_requests)):
+            opns_results = await timed_search(
+                "/search/batch", opns.msearch, body=msearch_body
+            )
+            await asyncio.gather(
+                *[
+                    add_hit_context(opns, request, index, opns_result)
+                    for (_, request, index, _), opns_result in zip(
+                        uncached_requests, opns_results["responses"]
+                    )
+                    if "error" not in opns_result
+                ]
+            )
+
+        for (position, request, _, cache_key), opns_result in zip(
+            uncached_requests, opns_results["responses"]
+        ):
+            if "error" in opns_result:
+                results[position] = {
+                    "status": opns_result.get("status", 500),
+                    "error": opns_result["error"],
+                }
+                continue
+
+            search_response = await run_in_executor(
+                format_search_response, request, opns_result
+            )
+            if is_complete(opns_result):
+                search_cache.set(cache_key, search_response)
+            results[position] = {"status": 200, "result": search_response}
+
+    return json_response(results, route="/search/batch")
+
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    Streaming response which frees an admission slot once it's been sent.
+
+    The slot is freed however sending ends, including when the client disconnects
+    before the body is read, which a `finally` in the body iterator wouldn't cover.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        """Send the response, then free the slot."""
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            search_admission.release()
+
+
+@app.post("/search/export")
+async def export_search(
+    request: SearchRequest,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    opns=Depends(get_opensearch_client),
+):
+    """
+    Export every result for a search as NDJSON or CSV.
+
+    The response is streamed, so memory use doesn't grow with the number of results.
+    Pagination, limit, offset, facets, compact and grouping in the request are
+    ignored. An export holds one admission slot until it's been sent, as it sends
+    one search at a time, so it can be shed before it starts like other searches.
+    """
+    index = await index_resolver.resolve(opns, request.index)
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    documents_index = None
+
+    if config.SEARCH_NORMALISED_DOCUMENTS:
+        documents_index = await index_resolver.resolve(
+            opns, request.index + DOCUMENTS_INDEX_SUFFIX
         )
 
-    if request.sort_field == "date":
-        # Default to descending if no sort order is provided
-        query_body["sort"] = [{"document_metadata.date": request.sort_order or "desc"}]
+    await search_admission.acquire()
 
-    opns_result = opns.search(index=request.index, body=query_body)
+    return AdmittedStreamingResponse(
+        export_search_results(opns, request, index, format, documents_index),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="search-results.{format}"'
+        },
+    )
 
-    # Manually fill in highlight field if no text was provided in the request, as Opensearch doesn't populate it in that case.
-    if not request.text:
-        for item in opns_result["hits"]["hits"]:
-            item["highlight"] = {}
-            item["highlight"]["text_html"] = [item["_source"]["text_html"]]
 
-    return opns_result
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check whether an If-None-Match header matches an ETag, using weak comparison."""
+    if if_none_match is None:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+async def get_cached_search_filters(opns: OpenSearch, index: str) -> tuple[dict, str]:
+    """
+    Get the search filters for an index and their ETag, from the cache if possible.
+
+    :param OpenSearch opns: OpenSearch client
+    :param str index: index name or alias, without the "-metadata" suffix
+    :return tuple[dict, str]: search filters, ETag
+    """
+    metadata_index = await index_resolver.resolve(opns, index + "-metadata")
+
+    if metadata_index not in search_filters_cache:
+        filters = await run_in_executor(opns.get, index=metadata_index, id="filters")
+        filters_json = json.dumps(filters["_source"], sort_keys=True)
+        digest = hashlib.sha1((metadata_index + filters_json).encode("utf-8"))
+        search_filters_cache[metadata_index] = (
+            filters["_source"],
+            f'"{digest.hexdigest()}"',
+        )
+
+    return search_filters_cache[metadata_index]
 
 
 @app.get("/searchFilters")
 async def get_search_filters(
-    index: str = "global-stocktake", opns=Depends(get_opensearch_client)
+    index: str = "global-stocktake",
+    if_none_match: Optional[str] = Header(default=None),
+    opns=Depends(get_opensearch_client),
 ):
-    """Get search filters."""
-    return opns.get(index=index + "-metadata", id="filters")["_source"]
+    """
+    Get search filters.
+
+    Filters are cached until the metadata alias is repointed, and are served with an
+    ETag so that browsers and the CDN can revalidate them with a 304 response.
+    """
+    search_filters, etag = await get_cached_search_filters(opns, index)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={config.SEARCH_FILTERS_MAX_AGE}",
+    }
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    return json_response(search_filters, route="/searchFilters", headers=headers)
@@ -0,0 +1,230 @@
+"""
+Minimal Prometheus-style metrics for the API.
+
+Metrics are kept in memory for each process and rendered in the Prometheus text
+exposition format by `Registry.render`, which the /metrics endpoint returns.
+"""
+
+import math
+import threading
+from collections import defaultdict
+from typing import Callable, Sequence
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(256 * 4**i for i in range(9))  # 256B to 16MB
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str]) -> str:
+    if not labelnames:
+        return ""
+
+    labels = ",".join(
+        f'{name}="{_escape(str(value))}"'
+        for name, value in zip(labelnames, labelvalues)
+    )
+
+    return "{" + labels + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+
+    return repr(float(value))
+
+
+class Counter:
+    """Count of events, optionally split by labels."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[LabelValues, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increase the count for a set of labels."""
+        key = tuple(labels[name] for name in self.labelnames)
+
+        with self._lock:
+            self._values[key] += amount
+
+    def samples(self) -> list[str]:
+        """Get the lines to render for this metric."""
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets, optionally split by labels."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: dict[LabelValues, list[int]] = {}
+        self._sums: dict[LabelValues, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record a value for a set of labels."""
+        key = tuple(labels[name] for name in self.labelnames)
+
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+
+            for idx, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    counts[idx] += 1
+
+            self._sums[key] += value
+
+    def samples(self) -> list[str]:
+        """Get the lines to render for this metric."""
+        lines = []
+
+        with self._lock:
+            for key, counts in sorted(self._counts.items()):
+                for upper_bound, count in zip(self.buckets, counts):
+                    labels = _format_labels(
+                        self.labelnames + ("le",), key + (_format_value(upper_bound),)
+                    )
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+
+                labels = _format_labels(self.labelnames, key)
+                lines.append(
+                    f"{self.name}_sum{labels} {_format_value(self._sums[key])}"
+                )
+                lines.append(f"{self.name}_count{labels} {counts[-1]}")
+
+        return lines
+
+
+class CallbackMetric:
+    """Metric whose values are read from a function when metrics are rendered, e.g. cache statistics."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        type: str,
+        labelnames: Sequence[str],
+        callback: Callable[[], dict[LabelValues, float]],
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def samples(self) -> list[str]:
+        """Get the lines to render for this metric."""
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self.callback().items())
+        ]
+
+
+class Registry:
+    """Collection of metrics to render together."""
+
+    def __init__(self):
+        self.metrics: list = []
+
+    def register(self, metric):
+        """Add a metric to the registry, and return it."""
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests by method, route and status code.",
+        ["method", "route", "status"],
+    )
+)
+HTTP_REQUEST_DURATION = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time to handle HTTP requests, by method and route.",
+        ["method", "route"],
+    )
+)
+HTTP_RESPONSE_SIZE = REGISTRY.register(
+    Histogram(
+        "http_response_size_bytes",
+        "Size of HTTP response bodies with a known length, by route.",
+        ["route"],
+        buckets=SIZE_BUCKETS,
+    )
+)
+OPENSEARCH_TOOK = REGISTRY.register(
+    Histogram(
+        "opensearch_took_seconds",
+        "Search time reported by OpenSearch in the 'took' field, by route.",
+        ["route"],
+    )
+)
+OPENSEARCH_ROUND_TRIP = REGISTRY.register(
+    Histogram(
+        "opensearch_round_trip_seconds",
+        "Time from sending a search to OpenSearch to having its parsed response, by route.",
+        ["route"],
+    )
+)
+RESPONSE_SERIALISATION = REGISTRY.register(
+    Histogram(
+        "response_serialisation_seconds",
+        "Time to serialise response bodies to JSON, by route.",
+        ["route"],
+    )
+)
+SEARCH_FILTERS_USED = REGISTRY.register(
+    Counter(
+        "search_filter_requests_total",
+        "Searches which used each filter.",
+        ["filter"],
+    )
+)
+SEARCH_SORTS_USED = REGISTRY.register(
+    Counter(
+        "search_sort_requests_total",
+        "Searches by sort field and order.",
+        ["sort"],
+    )
+)
@@ -0,0 +1,69 @@
+import time
+import logging
+from typing import Callable
+
+from opensearchpy import OpenSearch
+from opensearchpy.exceptions import NotFoundError
+
+from src.opensearch.client import run_in_executor
+
+LOGGER = logging.getLogger(__name__)
+
+
+class IndexResolver:
+    """
+    Resolve index aliases to the concrete indices they point to.
+
+    Resolved names are kept for `ttl` seconds, so an alias being repointed (e.g. by
+    `src.opensearch.update_aliases`) is noticed within that time. Callbacks registered
+    with `on_change` are called when that happens.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._resolved: dict[str, tuple[str, float]] = {}
+        self._callbacks: list[Callable[[str, str], None]] = []
+
+    def on_change(self, callback: Callable[[str, str], None]) -> None:
+        """Register a function to call with the alias and its new target when an alias is repointed."""
+        self._callbacks.append(callback)
+
+    @staticmethod
+    def lookup(opns: OpenSearch, name: str) -> str:
+        """
+        Get the concrete index name(s) for an alias from OpenSearch.
+
+        :param OpenSearch opns: OpenSearch client
+        :param str name: alias or index name
+        :return str: comma-separated concrete index names, or `name` if it isn't an alias
+        """
+        try:
+            aliases = opns.indices.get_alias(name=name)
+        except NotFoundError:
+            return name
+
+        return ",".join(sorted(aliases.keys()))
+
+    async def resolve(self, opns: OpenSearch, name: str) -> str:
+        """
+        Get the concrete index name(s) for an alias, looking it up again if the last lookup is older than `ttl`.
+
+        :param OpenSearch opns: OpenSearch client
+        :param str name: alias or index name
+        :return str: comma-separated concrete index names, or `name` if it isn't an alias
+        """
+        previous = self._resolved.get(name)
+
+        if previous is not None and time.monotonic() - previous[1] < self.ttl:
+            return previous[0]
+
+        resolved = await run_in_executor(self.lookup, opns, name)
+        self._resolved[name] = (resolved, time.monotonic())
+
+        if previous is not None and previous[0] != resolved:
+            LOGGER.info(f"Index {name} now points to {resolved}")
+
+            for callback in self._callbacks:
+                callback(name, resolved)
+
+        return resolved
@@ -0,0 +1,293 @@
+"""
+Bulk indexing from several threads, with retries and a dead-letter file.
+
+`opensearchpy.helpers.parallel_bulk` sends chunks of actions from a pool of threads,
+but doesn't retry anything, and `streaming_bulk` retries with a fixed chunk size.
+`BulkIndexer` sends chunks from a pool of threads like `parallel_bulk`, and:
+
+- limits chunks by both number of actions and size in bytes, as passages with their
+  HTML can be large
+- halves the chunk size when the cluster rejects a request as too large (413) or
+  too busy (429), and retries with exponential backoff
+- writes actions which still fail to an NDJSON dead-letter file, one per line with
+  the error, so they can be inspected and re-sent
+
+`SpooledActions` keeps actions to index later in a temporary file rather than in
+memory.
+"""
+
+import json
+import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+from opensearchpy import JSONSerializer, OpenSearch, TransportError, helpers
+
+LOGGER = logging.getLogger(__name__)
+
+
+class BulkItem:
+    """One action serialised for the bulk API, with its request body lines."""
+
+    __slots__ = ("action", "source", "body")
+
+    def __init__(self, action: dict, source: Optional[dict], body: bytes):
+        self.action = action
+        self.source = source
+        self.body = body
+
+
+class BulkIndexer:
+    """
+    Index actions with the bulk API from a pool of threads.
+
+    :param OpenSearch opns: OpenSearch client. Use one with `http_compress=True` to
+        gzip request bodies.
+    :param str index: index to send actions to
+    :param int threads: number of bulk requests in flight at once
+    :param int chunk_size: most actions in one request
+    :param int max_chunk_bytes: most bytes in one request, before compression
+    :param int max_retries: times to retry actions rejected with a 429 status
+    :param float initial_backoff: seconds to wait before the first retry, doubled for
+        each one after
+    :param Optional[Path] dead_letter_path: NDJSON file to append actions which still
+        failed to. If None, they're only logged.
+    :param float request_timeout: timeout for each bulk request in seconds
+    """
+
+    def __init__(
+        self,
+        opns: OpenSearch,
+        index: str,
+        threads: int = 4,
+        chunk_size: int = 500,
+        max_chunk_bytes: int = 10 * 1024**2,
+        max_retries: int = 5,
+        initial_backoff: float = 2,
+        dead_letter_path: Optional[Path] = None,
+        request_timeout: float = 60,
+    ):
+        self.opns = opns
+        self.index = index
+        self.threads = threads
+        self.chunk_size = chunk_size
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.dead_letter_path = dead_letter_path
+        self.request_timeout = request_timeout
+
+        self.docs = 0
+        self.bytes = 0
+        self.failed = 0
+        self.retries = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def serialise(self, data: Any) -> BulkItem:
+        """Serialise an action or document for the bulk API."""
+        action, source = helpers.expand_action(data)
+        serializer = self.opns.transport.serializer
+        lines = [action if isinstance(action, str) else serializer.dumps(action)]
+
+        if source is not None:
+            lines.append(
+                source if isinstance(source, str) else serializer.dumps(source)
+            )
+
+        return BulkItem(action, source, ("\n".join(lines) + "\n").encode("utf-8"))
+
+    def chunks(self, actions: Iterable[Any]) -> Iterator[list[BulkItem]]:
+        """
+        Group actions into chunks for bulk requests.
+
+        Limits are read as each chunk is built, so a chunk size reduced after a
+        rejected request applies to the following chunks.
+        """
+        chunk: list[BulkItem] = []
+        chunk_bytes = 0
+
+        for data in actions:
+            item = self.serialise(data)
+
+            if chunk and (
+                len(chunk) >= self.chunk_size
+                or chunk_bytes + len(item.body) > self.max_chunk_bytes
+            ):
+                yield chunk
+                chunk, chunk_bytes = [], 0
+
+            chunk.append(item)
+            chunk_bytes += len(item.body)
+
+        if chunk:
+            yield chunk
+
+    def index_actions(self, actions: Iterable[Any]) -> "BulkIndexer":
+        """
+        Index actions, reading them lazily and sending up to `threads` requests at once.
+
+        :param Iterable[Any] actions: documents or bulk actions, as accepted by
+            `opensearchpy.helpers.bulk`
+        :return BulkIndexer: this indexer, whose counts include the actions
+        """
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(
+            max_workers=self.threads, thread_name_prefix="bulk"
+        ) as executor:
+            pending = set()
+
+            for chunk in self.chunks(actions):
+                # Like `parallel_bulk`'s queue_size, only a few chunks wait for a
+                # thread, so actions aren't read far ahead of the requests
+                if len(pending) >= self.threads * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+
+                pending.add(executor.submit(self.send, chunk))
+
+            for future in pending:
+                future.result()
+
+        self.seconds += time.perf_counter() - start
+
+        return self
+
+    def send(self, chunk: list[BulkItem], attempt: int = 0) -> None:
+        """Send one chunk, retrying or dead-lettering the actions which are rejected."""
+        try:
+            response = self.opns.bulk(
+                body=b"".join(item.body for item in chunk),
+                index=self.index,
+                request_timeout=self.request_timeout,
+            )
+        except TransportError as e:
+            if e.status_code == 413 and len(chunk) > 1:
+                self.shrink(chunk, reason="request too large")
+                middle = len(chunk) // 2
+                self.send(chunk[:middle], attempt)
+                self.send(chunk[middle:], attempt)
+            elif e.status_code == 429 and attempt < self.max_retries:
+                self.shrink(chunk, reason="too many requests")
+                self.retry(chunk, attempt)
+            elif isinstance(e.status_code, int):
+                self.dead_letter(chunk, e.status_code, str(e))
+            else:
+                # Connection errors aren't the actions' fault, so stop indexing
+                raise
+            return
+
+        retry = []
+
+        for item, result in zip(chunk, response["items"]):
+            info = next(iter(result.values()))
+            status = info.get("status", 500)
+
+            if 200 <= status < 300:
+                with self._lock:
+                    self.docs += 1
+                    self.bytes += len(item.body)
+            elif status == 429 and attempt < self.max_retries:
+                retry.append(item)
+            else:
+                self.dead_letter([item], status, info.get("error"))
+
+        if retry:
+            self.shrink(chunk, reason="too many requests")
+            self.retry(retry, attempt)
+
+    def retry(self, chunk: list[BulkItem], attempt: int) -> None:
+        """Send a chunk again after waiting, in chunks of the current chunk size."""
+        time.sleep(self.initial_backoff * 2**attempt)
+
+        with self._lock:
+            self.retries += 1
+            chunk_size = self.chunk_size
+
+        for i in range(0, len(chunk), chunk_size):
+            self.send(chunk[i : i + chunk_size], attempt + 1)
+
+    def shrink(self, chunk: list[BulkItem], reason: str) -> None:
+        """Halve the chunk limits after a chunk was rejected, if they're not smaller already."""
+        chunk_bytes = sum(len(item.body) for item in chunk)
+
+        with self._lock:
+            chunk_size = max(1, min(self.chunk_size, len(chunk) // 2))
+            max_chunk_bytes = max(1, min(self.max_chunk_bytes, chunk_bytes // 2))
+
+            if (chunk_size, max_chunk_bytes) == (self.chunk_size, self.max_chunk_bytes):
+                return
+
+            self.chunk_size, self.max_chunk_bytes = chunk_size, max_chunk_bytes
+
+        LOGGER.warning(
+            f"Bulk request rejected ({reason}), reducing chunks to {chunk_size} docs / {max_chunk_bytes / 1024**2:.2f} MB"
+        )
+
+    def dead_letter(self, chunk: list[BulkItem], status: int, error: Any) -> None:
+        """Record actions which couldn't be indexed."""
+        LOGGER.error(f"{len(chunk)} action(s) failed to index with status {status}")
+
+        with self._lock:
+            self.failed += len(chunk)
+
+            if self.dead_letter_path is None:
+                return
+
+            with open(self.dead_letter_path, "a") as f:
+                for item in chunk:
+                    record = {
+                        "action": item.action,
+                        "source": item.source,
+                        "status": status,
+                        "error": error,
+                    }
+                    f.write(json.dumps(record, default=str) + "\n")
+
+    def summary(self) -> str:
+        """Describe the throughput and failures of everything indexed so far."""
+        mb = self.bytes / 1024**2
+        seconds = max(self.seconds, 1e-9)
+
+        return (
+            f"{self.docs} docs, {mb:.1f} MB in {self.seconds:.1f}s "
+            f"({self.docs / seconds:.1f} docs/s, {mb / seconds:.2f} MB/s); "
+            f"{self.failed} failed, {self.retries} retries"
+        )
+
+
+class SpooledActions:
+    """
+    Actions written to a temporary NDJSON file as they're produced, to be indexed later.
+
+    Memory use doesn't grow with the number of actions. Values such as dates are
+    serialised as the OpenSearch client would, so reading them back gives the same
+    request bodies. The file is deleted when the spool is closed.
+    """
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.serializer = JSONSerializer()
+        self.count = 0
+
+    def add(self, action: dict) -> None:
+        """Append an action to the spool."""
+        self.file.write(self.serializer.dumps(action) + "\n")
+        self.count += 1
+
+    def __iter__(self) -> Iterator[dict]:
+        """Read the actions back in the order they were added, one at a time."""
+        self.file.seek(0)
+
+        for line in self.file:
+            yield json.loads(line)
+
+    def close(self) -> None:
+        """Delete the spool's file."""
+        self.file.close()
@@ -1,10 +1,65 @@
 import os
+import asyncio
+import functools
+import socket
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
 
-from opensearchpy import OpenSearch
+from opensearchpy import OpenSearch, Urllib3HttpConnection
+from urllib3.connection import HTTPConnection
 
+from src import config
 
-def get_opensearch_client() -> OpenSearch:
-    client = OpenSearch(
+LOGGER = logging.getLogger(__name__)
+
+_client: Optional[OpenSearch] = None
+_client_lock = threading.Lock()
+
+# Blocking client calls made by the API run in this pool. It's the same size as the
+# connection pool, so every thread can hold a connection without waiting for another.
+_executor = ThreadPoolExecutor(
+    max_workers=config.OPENSEARCH_POOL_MAXSIZE, thread_name_prefix="opensearch"
+)
+
+T = TypeVar("T")
+
+
+class KeepAliveHttpConnection(Urllib3HttpConnection):
+    """
+    Urllib3 connection which turns on TCP keep-alive for its pooled sockets.
+
+    Without this, idle connections in the pool can be silently dropped by load
+    balancers between requests, and the next request pays for a new TLS handshake.
+    """
+
+    def __init__(self, *args, keepalive_idle: int = 60, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        socket_options = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        ]
+
+        # TCP_KEEPIDLE isn't available on every platform (e.g. macOS)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            socket_options.append(
+                (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, keepalive_idle)
+            )
+
+        self.pool.conn_kw["socket_options"] = socket_options
+
+
+def create_opensearch_client(http_compress: bool = False) -> OpenSearch:
+    """
+    Create a new OpenSearch client with a pool of keep-alive connections.
+
+    Pool size, keep-alive and timeouts are set in `src.config`.
+
+    :param bool http_compress: gzip request bodies. Worth it for bulk indexing, which
+        sends far more than it receives.
+    """
+    return OpenSearch(
         [os.environ["OPENSEARCH_HOST"]],
         http_auth=(
             os.environ["OPENSEARCH_USERNAME"],
@@ -13,9 +68,51 @@ def get_opensearch_client() -> OpenSearch:
         use_ssl=True,
         verify_certs=True,
         ssl_show_warn=True,
+        connection_class=KeepAliveHttpConnection,
+        maxsize=config.OPENSEARCH_POOL_MAXSIZE,
+        keepalive_idle=config.OPENSEARCH_KEEPALIVE_IDLE,
+        timeout=config.OPENSEARCH_TIMEOUT,
+        http_compress=http_compress,
     )
 
-    if not client.ping():
-        raise RuntimeError("Connection failed")
 
-    return client
+def get_opensearch_client() -> OpenSearch:
+    """
+    Get the OpenSearch client shared by this process.
+
+    The client is created on first use, without connecting, so the API can start
+    while the cluster is unreachable. Connectivity is checked by
+    `src.opensearch.health.HealthMonitor`. After that the same client (and so the
+    same connection pool) is returned on every call.
+    """
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = create_opensearch_client()
+
+    return _client
+
+
+def close_opensearch_client() -> None:
+    """Close the shared OpenSearch client's connections, if it has been created."""
+    global _client
+
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def run_in_executor(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking OpenSearch client call without blocking the event loop.
+
+    Calls run in a bounded thread pool, so one API worker can keep many searches in
+    flight at once while still capping the load it puts on the cluster.
+    """
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(
+        _executor, functools.partial(func, *args, **kwargs)
+    )
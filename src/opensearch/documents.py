@@ -0,0 +1,157 @@
+"""
+Document metadata: keeping it out of passages, adding it back to search results, and collecting filter values from it.
+
+Indices built with `index_data.py --normalise-documents` store each document's
+metadata once, in an index with the suffix `DOCUMENTS_INDEX_SUFFIX`, rather than in
+every passage. Passages only keep the metadata they're filtered and sorted on.
+"""
+
+from datetime import date
+from typing import TYPE_CHECKING, Iterable, Optional, Sequence
+
+from opensearchpy import OpenSearch
+
+from src.opensearch.client import run_in_executor
+from src.opensearch.response import inner_hits
+
+if TYPE_CHECKING:
+    from cpr_data_access.models import GSTDocument
+
+DOCUMENTS_INDEX_SUFFIX = "-documents"
+
+# Document metadata kept on each passage when documents are indexed separately, as
+# passages are filtered and sorted on it. The rest is added to search results from
+# the documents index by `hydrate_documents`.
+PASSAGE_DOCUMENT_METADATA_FIELDS = {"date", "author", "types"}
+
+
+def passage_document_fields(document_source: dict) -> dict:
+    """
+    Get the fields of a document kept on each of its passages when documents are indexed separately.
+
+    :param dict document_source: all of the document's fields, as indexed in the
+        documents index
+    :return dict: document ID and the metadata in `PASSAGE_DOCUMENT_METADATA_FIELDS`
+    """
+    return {
+        "document_id": document_source["document_id"],
+        "document_metadata": {
+            field: value
+            for field, value in document_source["document_metadata"].items()
+            if field in PASSAGE_DOCUMENT_METADATA_FIELDS
+        },
+    }
+
+
+def all_hits(hits: Iterable[dict]) -> list[dict]:
+    """Get hits and their inner hits from a search grouped by document, in one list."""
+    return [hit for item in hits for hit in [item] + inner_hits(item)]
+
+
+def merge_document(document: dict, source: dict) -> dict:
+    """
+    Merge a document's fields into a passage's source.
+
+    The passage's values win, and `document_metadata` is merged rather than replaced,
+    as passages keep some of it.
+    """
+    merged = document | source
+
+    if "document_metadata" in document and "document_metadata" in source:
+        merged["document_metadata"] = (
+            document["document_metadata"] | source["document_metadata"]
+        )
+
+    return merged
+
+
+async def hydrate_documents(
+    opns: OpenSearch,
+    documents_index: str,
+    hits: Iterable[dict],
+    fields: Optional[Sequence[str]] = None,
+    exclude_fields: Optional[Sequence[str]] = None,
+) -> None:
+    """
+    Add document fields to hits, fetching every document they're from in one mget.
+
+    :param OpenSearch opns: OpenSearch client
+    :param str documents_index: documents index name or alias
+    :param Iterable[dict] hits: OpenSearch hits, which are changed in place
+    :param Optional[Sequence[str]] fields: document fields to include. Wildcards are
+        allowed.
+    :param Optional[Sequence[str]] exclude_fields: document fields to exclude
+    """
+    hits = [hit for hit in all_hits(hits) if "_source" in hit]
+    document_ids = list(
+        dict.fromkeys(
+            hit["_source"]["document_id"]
+            for hit in hits
+            if "document_id" in hit["_source"]
+        )
+    )
+
+    if not document_ids:
+        return
+
+    params = {}
+    if fields:
+        params["_source_includes"] = ",".join(fields)
+    if exclude_fields:
+        params["_source_excludes"] = ",".join(exclude_fields)
+
+    result = await run_in_executor(
+        opns.mget, index=documents_index, body={"ids": document_ids}, **params
+    )
+    documents = {
+        doc["_id"]: doc.get("_source", {}) for doc in result["docs"] if doc.get("found")
+    }
+
+    for hit in hits:
+        document = documents.get(hit["_source"].get("document_id"))
+
+        if document is not None:
+            hit["_source"] = merge_document(document, hit["_source"])
+
+
+class FilterValues:
+    """
+    Values to power UI filters, collected from documents one at a time as they're indexed.
+
+    :param dict[str, list[str]] concepts: concept filter values from
+        `index_data.load_concept_spans`
+    """
+
+    def __init__(self, concepts: dict[str, list[str]]):
+        self.concepts = concepts
+        self.date_min: Optional[date] = None
+        self.date_max: Optional[date] = None
+        self.authors: set[str] = set()
+        self.types: set[str] = set()
+
+    def add(self, doc: "GSTDocument") -> None:
+        """Add a document's date, authors and types."""
+        doc_date = doc.document_metadata.date
+
+        if doc_date is not None:
+            self.date_min = min(self.date_min or doc_date, doc_date)
+            self.date_max = max(self.date_max or doc_date, doc_date)
+
+        self.authors.update(doc.document_metadata.author)
+        self.types.update(doc.document_metadata.types)
+
+    def to_dict(self) -> dict:
+        """Get filter values in the same format as `index_data.get_dataset_and_filter_values`."""
+        return {
+            "dates": {
+                "date_min": self.date_min.strftime("%Y-%m-%d")
+                if self.date_min
+                else None,
+                "date_max": self.date_max.strftime("%Y-%m-%d")
+                if self.date_max
+                else None,
+            },
+            "authors": sorted(self.authors),
+            "types": sorted(self.types),
+            "concepts": self.concepts,
+        }
@@ -0,0 +1,189 @@
+import asyncio
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Iterable, Optional
+
+from opensearchpy import OpenSearch
+
+from src import config
+from src.opensearch.client import run_in_executor
+from src.opensearch.documents import hydrate_documents
+from src.opensearch.query import SearchRequest, build_search_query
+
+# Fields exported when the request doesn't set `fields`
+DEFAULT_EXPORT_FIELDS = [
+    "document_id",
+    "document_name",
+    "document_metadata.date",
+    "document_metadata.author",
+    "document_metadata.types",
+    "text_block_id",
+    "page_number",
+    "text",
+    "span_types",
+]
+
+
+async def close_point_in_time(
+    opns: OpenSearch, pit: "asyncio.Future[dict]", pit_id: Optional[str]
+) -> None:
+    """
+    Delete a point in time, waiting for it to be created if that was interrupted.
+
+    :param OpenSearch opns: OpenSearch client
+    :param asyncio.Future[dict] pit: the create point in time call
+    :param Optional[str] pit_id: latest ID of the point in time, or None if the
+        export stopped before it was created
+    """
+    if pit_id is None:
+        try:
+            pit_id = (await pit)["pit_id"]
+        except Exception:
+            # It was never created
+            return
+
+    await run_in_executor(
+        opns.delete_point_in_time, body={"pit_id": [pit_id]}, ignore=404
+    )
+
+
+async def iter_search_hits(
+    opns: OpenSearch, request: SearchRequest, index: str
+) -> AsyncIterator[list[dict]]:
+    """
+    Get every hit for a search request, one page of `request.limit` hits at a time.
+
+    Pages are fetched with a point in time and search_after, so each one costs the
+    same however deep into the results it is. The point in time is created when the
+    first page is requested, and deleted at the end, including when iteration stops
+    early because the generator is closed or its task is cancelled, e.g. when the
+    client disconnects from a streamed export.
+
+    :param OpenSearch opns: OpenSearch client
+    :param SearchRequest request: search request
+    :param str index: concrete index name(s) to search
+    :yield list[dict]: OpenSearch hits
+    """
+    pit = asyncio.ensure_future(
+        run_in_executor(
+            opns.create_point_in_time,
+            index=index,
+            keep_alive=config.SEARCH_PIT_KEEP_ALIVE,
+        )
+    )
+    pit_id = None
+    search_after = None
+
+    try:
+        pit_id = (await asyncio.shield(pit))["pit_id"]
+
+        while True:
+            query_body = build_search_query(
+                request, pit_id=pit_id, search_after=search_after
+            )
+            # Highlights aren't exported
+            query_body.pop("highlight", None)
+
+            opns_result = await run_in_executor(opns.search, body=query_body)
+            hits = opns_result["hits"]["hits"]
+
+            if hits:
+                yield hits
+
+            if len(hits) < request.limit:
+                break
+
+            pit_id = opns_result.get("pit_id", pit_id)
+            search_after = hits[-1]["sort"]
+    finally:
+        # Shielded, so that a cancelled export still deletes the point in time
+        await asyncio.shield(close_point_in_time(opns, pit, pit_id))
+
+
+def get_field(source: dict, field: str) -> Any:
+    """Get a value from a nested dictionary by a dotted field name, e.g. `document_metadata.date`."""
+    value: Any = source
+
+    for key in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+
+    return value
+
+
+def hits_to_ndjson(hits: Iterable[dict]) -> str:
+    """Convert hits to newline-delimited JSON, with one line per hit's source."""
+    return "".join(
+        json.dumps(hit["_source"], ensure_ascii=False) + "\n" for hit in hits
+    )
+
+
+def hits_to_csv(hits: Iterable[dict], fields: list[str]) -> str:
+    """Convert hits to CSV rows, with one column per field. Lists are joined with semicolons."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+
+    for hit in hits:
+        row = []
+        for field in fields:
+            value = get_field(hit["_source"], field)
+            row.append("; ".join(map(str, value)) if isinstance(value, list) else value)
+        writer.writerow(row)
+
+    return output.getvalue()
+
+
+async def export_search_results(
+    opns: OpenSearch,
+    request: SearchRequest,
+    index: str,
+    format: str,
+    documents_index: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Stream every result for a search request as NDJSON or CSV.
+
+    Only one page of `config.SEARCH_EXPORT_PAGE_SIZE` hits is held in memory at a time.
+
+    :param OpenSearch opns: OpenSearch client
+    :param SearchRequest request: search request
+    :param str index: concrete index name(s) to search
+    :param str format: "ndjson" or "csv"
+    :param Optional[str] documents_index: documents index to add document fields to
+        each page of hits from, for indices which don't store them in every passage.
+        See `src.opensearch.documents`.
+    :yield str: chunks of the export
+    """
+    fields = list(request.fields or DEFAULT_EXPORT_FIELDS)
+    export_request = request.copy(
+        update={
+            "fields": fields,
+            "limit": config.SEARCH_EXPORT_PAGE_SIZE,
+            "track_total_hits": False,
+            "facets": False,
+            "compact": False,
+            "group_by_document": False,
+        }
+    )
+
+    if format == "csv":
+        header = io.StringIO()
+        csv.writer(header).writerow(fields)
+        yield header.getvalue()
+
+    pages = iter_search_hits(opns, export_request, index)
+
+    try:
+        async for hits in pages:
+            if documents_index is not None:
+                await hydrate_documents(opns, documents_index, hits, fields=fields)
+
+            if format == "csv":
+                yield hits_to_csv(hits, fields)
+            else:
+                yield hits_to_ndjson(hits)
+    finally:
+        # Close the pages as soon as the export is, to delete their point in time
+        await pages.aclose()
@@ -0,0 +1,137 @@
+"""
+Report how much disk space each field of an index uses.
+
+OpenSearch has no per-field disk usage API, so this measures it by ablation: a sample
+of documents is indexed into a scratch index with the current mapping, then once more
+for each top-level field with that field removed, and the difference in store size is
+what the field costs. Each scratch index is force-merged to one segment so that sizes
+are comparable. `_source` is measured the same way, by disabling it.
+
+Run against an existing index, e.g.:
+
+    poetry run python -m src.opensearch.field_disk_usage global-stocktake-docs
+
+With `--index-mapping`, the existing index's own mapping is used rather than the one
+in `index_settings`, so that the two can be compared.
+"""
+
+import copy
+import logging
+from logging import getLogger
+from typing import Optional
+
+import click
+from dotenv import load_dotenv, find_dotenv
+from opensearchpy import OpenSearch, helpers
+
+from src.opensearch.client import get_opensearch_client
+from src.opensearch.index_settings import index_settings
+
+logging.basicConfig(level=logging.INFO)
+LOGGER = getLogger(__name__)
+
+SCRATCH_INDEX = "field-disk-usage-scratch"
+
+
+def sample_documents(opns: OpenSearch, index: str, size: int) -> list[dict]:
+    """Get the sources of up to `size` documents from an index."""
+    docs = []
+
+    for hit in helpers.scan(opns, index=index, query={"query": {"match_all": {}}}):
+        docs.append(hit["_source"])
+        if len(docs) >= size:
+            break
+
+    return docs
+
+
+def existing_index_settings(opns: OpenSearch, index: str) -> dict:
+    """Get the mapping and analysis settings of an existing index, to create another like it."""
+    mapping = next(iter(opns.indices.get_mapping(index=index).values()))
+    settings = next(iter(opns.indices.get_settings(index=index).values()))
+
+    return {
+        "settings": {
+            "index": {"number_of_shards": 1},
+            "analysis": settings["settings"]["index"].get("analysis", {}),
+        },
+        "mappings": mapping["mappings"],
+    }
+
+
+def indexed_size_bytes(
+    opns: OpenSearch, settings: dict, docs: list[dict], drop_field: Optional[str] = None
+) -> int:
+    """
+    Index documents into a scratch index, and get its size once merged to one segment.
+
+    :param OpenSearch opns: OpenSearch client
+    :param dict settings: index settings and mappings
+    :param list[dict] docs: document sources
+    :param Optional[str] drop_field: top-level field to remove from every document
+    :return int: size of the scratch index's primary store in bytes
+    """
+    opns.indices.delete(index=SCRATCH_INDEX, ignore=404)
+    opns.indices.create(index=SCRATCH_INDEX, body=settings)
+
+    try:
+        helpers.bulk(
+            opns,
+            ({k: v for k, v in doc.items() if k != drop_field} for doc in docs),
+            index=SCRATCH_INDEX,
+            request_timeout=60,
+        )
+        opns.indices.refresh(index=SCRATCH_INDEX)
+        opns.indices.forcemerge(
+            index=SCRATCH_INDEX, max_num_segments=1, request_timeout=600
+        )
+        stats = opns.indices.stats(index=SCRATCH_INDEX, metric="store")
+
+        return stats["_all"]["primaries"]["store"]["size_in_bytes"]
+    finally:
+        opns.indices.delete(index=SCRATCH_INDEX, ignore=404)
+
+
+@click.command()
+@click.argument("index")
+@click.option(
+    "--sample-size", "-n", type=int, default=5000, help="Documents to measure with"
+)
+@click.option(
+    "--index-mapping",
+    is_flag=True,
+    default=False,
+    help="Use the mapping of INDEX rather than the one in index_settings",
+)
+def main(index: str, sample_size: int, index_mapping: bool):
+    """Report the disk usage of each top-level field of INDEX."""
+    load_dotenv(find_dotenv())
+    opns = get_opensearch_client()
+    settings = existing_index_settings(opns, index) if index_mapping else index_settings
+
+    LOGGER.info(f"Sampling {sample_size} documents from {index}")
+    docs = sample_documents(opns, index, sample_size)
+    fields = sorted({field for doc in docs for field in doc})
+
+    baseline = indexed_size_bytes(opns, settings, docs)
+    usage = {}
+
+    for field in fields:
+        LOGGER.info(f"Measuring {field}")
+        usage[field] = baseline - indexed_size_bytes(
+            opns, settings, docs, drop_field=field
+        )
+
+    no_source_settings = copy.deepcopy(settings)
+    no_source_settings["mappings"]["_source"] = {"enabled": False}
+    usage["_source"] = baseline - indexed_size_bytes(opns, no_source_settings, docs)
+
+    click.echo(f"{len(docs)} documents, {baseline / 1024**2:.2f} MB in total")
+    click.echo(f"{'field':<30} {'MB':>10} {'%':>6}")
+
+    for field, size in sorted(usage.items(), key=lambda item: -item[1]):
+        click.echo(f"{field:<30} {size / 1024**2:>10.2f} {100 * size / baseline:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+from opensearchpy import OpenSearch
+
+from src.opensearch.aliases import IndexResolver
+from src.opensearch.client import run_in_executor
+
+LOGGER = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """
+    Check the health of an OpenSearch cluster and its search aliases in the background.
+
+    Each check pings the cluster, gets its health, and checks that each alias resolves
+    to an index containing documents. The latest report is kept in `report`, so
+    reading it doesn't make any calls to the cluster.
+    """
+
+    def __init__(self, client: OpenSearch, aliases: Sequence[str], interval: float):
+        self.client = client
+        self.aliases = aliases
+        self.interval = interval
+        self.report: dict[str, Any] = {
+            "status": "UNKNOWN",
+            "checked_at": None,
+            "checks": {},
+        }
+
+    @property
+    def is_alive(self) -> Optional[bool]:
+        """Whether the cluster responded to the last ping, or None if it hasn't been checked yet."""
+        return self.report["checks"].get("ping", {}).get("ok")
+
+    @property
+    def is_healthy(self) -> bool:
+        """Whether every check passed in the last report."""
+        return self.report["status"] == "OK"
+
+    def _check_ping(self) -> dict[str, Any]:
+        return {"ok": bool(self.client.ping())}
+
+    def _check_cluster(self) -> dict[str, Any]:
+        cluster_health = self.client.cluster.health()
+
+        return {
+            "ok": cluster_health["status"] in {"green", "yellow"},
+            "status": cluster_health["status"],
+        }
+
+    def _check_alias(self, alias: str) -> dict[str, Any]:
+        index = IndexResolver.lookup(self.client, alias)
+
+        if index == alias:
+            return {"ok": False, "error": f"{alias} is not an alias"}
+
+        doc_count = self.client.count(index=index)["count"]
+
+        return {"ok": doc_count > 0, "index": index, "doc_count": doc_count}
+
+    def check(self) -> dict[str, Any]:
+        """Run all checks and record the result in `report`."""
+        checks = {}
+        check_functions = {
+            "ping": self._check_ping,
+            "cluster": self._check_cluster,
+        } | {
+            f"alias:{alias}": lambda alias=alias: self._check_alias(alias)
+            for alias in self.aliases
+        }
+
+        for name, check_function in check_functions.items():
+            try:
+                checks[name] = check_function()
+            except Exception as e:
+                checks[name] = {"ok": False, "error": str(e)}
+
+        status = "OK" if all(check["ok"] for check in checks.values()) else "ERROR"
+
+        if status != self.report["status"]:
+            LOGGER.log(
+                logging.INFO if status == "OK" else logging.WARNING,
+                f"OpenSearch health is {status}: {checks}",
+            )
+
+        self.report = {
+            "status": status,
+            "checked_at": datetime.now().isoformat(),
+            "checks": checks,
+        }
+
+        return self.report
+
+    async def run(self) -> None:
+        """Run the checks every `interval` seconds until cancelled."""
+        while True:
+            await run_in_executor(self.check)
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,303 @@
+"""
+Highlighting search matches in pre-rendered passage HTML.
+
+Searches match and highlight the plain `text` field, which is indexed with offsets so
+OpenSearch can find matches without re-analysing it. The matched character ranges are
+then mapped onto `text_html`, which contains the same text with span markup and
+concept labels around it.
+
+Text and HTML are aligned on their non-whitespace characters, as whitespace differs
+between the two (see `fix_text_block_string` and `text_block_to_html` in
+`src.opensearch.index_data`).
+"""
+
+import html
+import logging
+import re
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Optional
+
+LOGGER = logging.getLogger(__name__)
+
+MARK_START = '<mark class="search-highlight" style="background: #fbec5d; padding: 0.45em 0.6em; margin: 0 0.25em; line-height: 1; border-radius: 0.35em;">'
+MARK_END = "</mark>"
+
+# Tags OpenSearch puts around matches in the highlighted `text` field. They're
+# private-use characters so that they can't appear in passage text.
+MATCH_START = "\ue000"
+MATCH_END = "\ue001"
+
+# Elements whose text is a concept label added to the HTML, rather than passage text
+LABEL_CLASSES = {"span-label", "concept-label", "subconcept-label"}
+
+HTML_TOKEN = re.compile(r"<[^>]*>|&#?\w+;|[^<&]+|[<&]")
+WHITESPACE = re.compile(r"(\s+)")
+CLASS_ATTRIBUTE = re.compile(r"""class\s*=\s*["']([^"']*)["']""")
+
+
+def match_offsets(highlighted_text: str) -> list[tuple[int, int]]:
+    """
+    Get the character ranges of matches in text highlighted with `MATCH_START` and `MATCH_END`.
+
+    :param str highlighted_text: highlighted text from OpenSearch
+    :return list[tuple[int, int]]: (start, end) of each match in the unhighlighted text
+    """
+    offsets = []
+    position = 0
+    start = None
+
+    for part in re.split(f"({MATCH_START}|{MATCH_END})", highlighted_text):
+        if part == MATCH_START:
+            start = position
+        elif part == MATCH_END:
+            if start is not None and position > start:
+                offsets.append((start, position))
+            start = None
+        else:
+            position += len(part)
+
+    return offsets
+
+
+def _match_boundaries(
+    text: str, offsets: list[tuple[int, int]]
+) -> tuple[list[int], set[int], set[int]]:
+    """
+    Get the indices among non-whitespace characters of `text` of the first and last character of each match.
+
+    :return tuple[list[int], set[int], set[int]]: every boundary in order, first
+        characters, last characters
+    """
+    # Count the non-whitespace characters before each offset a slice at a time, as
+    # a Python loop over every character of a long passage is slow
+    non_whitespace_before = {}
+    count = previous = 0
+
+    for offset in sorted({offset for match in offsets for offset in match}):
+        count += len("".join(text[previous:offset].split()))
+        non_whitespace_before[offset] = count
+        previous = offset
+
+    starts, ends = set(), set()
+
+    for start, end in offsets:
+        first = non_whitespace_before[start]
+        last = non_whitespace_before[end] - 1
+
+        if last >= first:
+            starts.add(first)
+            ends.add(last)
+
+    return sorted(starts | ends), starts, ends
+
+
+def _split_at_boundaries(
+    token: str, position: int, length: int, boundaries: list[int]
+) -> list[str]:
+    """
+    Split a run of text so that each character at a match boundary is on its own.
+
+    :param str token: run of text from the HTML
+    :param int position: index among non-whitespace characters of the run's first
+    :param int length: number of non-whitespace characters in the run
+    :param list[int] boundaries: sorted indices of match boundaries, as from
+        `_match_boundaries`
+    :return list[str]: pieces of the run
+    """
+    first = bisect_left(boundaries, position)
+    last = bisect_left(boundaries, position + length)
+
+    if first == last:
+        return [token]
+
+    # Words alternate with whitespace, so the word a boundary is in, and so its
+    # index in the run, can be found from the running lengths of the words
+    parts = WHITESPACE.split(token)
+    part_ends = list(accumulate(map(len, parts)))
+    word_ends = list(accumulate(map(len, parts[::2])))
+    cuts = [0]
+
+    for boundary in boundaries[first:last]:
+        offset = boundary - position
+        word = bisect_right(word_ends, offset)
+        word_start = part_ends[2 * word] - len(parts[2 * word])
+        index = word_start + offset - (word_ends[word - 1] if word else 0)
+        cuts.extend([index, index + 1])
+
+    cuts.append(len(token))
+
+    return [token[start:end] for start, end in zip(cuts, cuts[1:]) if end > start]
+
+
+def highlight_html(
+    text_html: str, text: str, offsets: list[tuple[int, int]]
+) -> Optional[str]:
+    """
+    Wrap the characters of `text_html` which correspond to matches in `text` in highlight marks.
+
+    Marks are closed before and reopened after any tags inside a match, so the HTML
+    stays well-formed. Concept labels are never highlighted.
+
+    Runs of text are checked against `text` and copied whole, apart from the
+    characters where matches start or end, and the HTML after the last match is
+    copied without being checked. So the time this takes depends on the number of
+    tags and matches more than on the length of the text.
+
+    :param str text_html: passage HTML
+    :param str text: passage text
+    :param list[tuple[int, int]] offsets: (start, end) of each match in `text`
+    :return Optional[str]: highlighted HTML, or None if the HTML's text doesn't match
+        `text`
+    """
+    expected = "".join(text.split())
+    boundaries, starts, ends = _match_boundaries(text, offsets)
+
+    if not boundaries:
+        return text_html
+
+    output = []
+    # Whether each open span is a label, and how many labels are open
+    label_stack: list[bool] = []
+    open_labels = 0
+    position = 0
+    in_match = False
+    mark_open = False
+
+    for token_match in HTML_TOKEN.finditer(text_html):
+        if position > boundaries[-1] and not mark_open:
+            output.append(text_html[token_match.start() :])
+            return "".join(output)
+
+        token = token_match.group()
+
+        if token.startswith("<") and len(token) > 1:
+            if mark_open:
+                output.append(MARK_END)
+                mark_open = False
+
+            if token.startswith("</span"):
+                if label_stack:
+                    open_labels -= label_stack.pop()
+            elif token.startswith("<span"):
+                classes = CLASS_ATTRIBUTE.search(token)
+                is_label = classes is not None and bool(
+                    LABEL_CLASSES & set(classes.group(1).split())
+                )
+                label_stack.append(is_label)
+                open_labels += is_label
+
+            output.append(token)
+            continue
+
+        if open_labels:
+            output.append(token)
+            continue
+
+        # An entity is one character of text, so is highlighted or not as a whole
+        unescaped = html.unescape(token) if token.startswith("&") else token
+
+        if token.startswith("&") and len(unescaped) == 1:
+            pieces = [token]
+        else:
+            compact = "".join(token.split())
+
+            if compact != expected[position : position + len(compact)]:
+                LOGGER.debug(
+                    "Passage HTML doesn't match its text, so isn't highlighted"
+                )
+                return None
+
+            pieces = _split_at_boundaries(token, position, len(compact), boundaries)
+
+        for piece in pieces:
+            char = unescaped if piece is token and unescaped != token else piece
+
+            if char.isspace() or char.strip() == "":
+                output.append(piece)
+                continue
+
+            if len(char) > 1:
+                # No match starts or ends in the piece, so it's all in or out of one
+                if in_match and not mark_open:
+                    # The mark opens on the first non-whitespace character
+                    leading = len(piece) - len(piece.lstrip())
+                    output.extend([piece[:leading], MARK_START, piece[leading:]])
+                    mark_open = True
+                else:
+                    output.append(piece)
+
+                position += len("".join(piece.split()))
+                continue
+
+            if position >= len(expected) or expected[position] != char:
+                LOGGER.debug(
+                    "Passage HTML doesn't match its text, so isn't highlighted"
+                )
+                return None
+
+            if position in starts:
+                in_match = True
+
+            if in_match and not mark_open:
+                output.append(MARK_START)
+                mark_open = True
+
+            output.append(piece)
+
+            if position in ends:
+                output.append(MARK_END)
+                in_match = mark_open = False
+
+            position += 1
+
+    if mark_open:
+        output.append(MARK_END)
+
+    if position != len(expected):
+        LOGGER.debug("Passage HTML doesn't match its text, so isn't highlighted")
+        return None
+
+    return "".join(output)
+
+
+def mark_text(highlighted_text: str) -> str:
+    """Escape highlighted text as HTML, and replace `MATCH_START` and `MATCH_END` with highlight marks."""
+    return (
+        html.escape(highlighted_text, quote=False)
+        .replace(MATCH_START, MARK_START)
+        .replace(MATCH_END, MARK_END)
+    )
+
+
+def add_html_highlight(hit: dict) -> None:
+    """
+    Replace a hit's highlighted `text` with its highlighted `text_html`.
+
+    The whole of `text` is highlighted, so it's taken from the highlight rather than
+    the hit's source. If the text can't be aligned with `text_html`, or nothing in
+    `text` matched, the unhighlighted `text_html` is used. Hits whose `text_html`
+    isn't in the source, e.g. because of the request's `fields`, keep the highlighted
+    `text`, with the same marks as the HTML.
+
+    :param dict hit: OpenSearch hit from a query built by
+        `src.opensearch.query.build_search_query`
+    """
+    highlight = hit.get("highlight", {})
+    source = hit.get("_source", {})
+
+    if "text_html" not in source:
+        if "text" in highlight:
+            highlight["text"] = [mark_text(text) for text in highlight["text"]]
+        return
+
+    highlighted_text = highlight.pop("text", None)
+    text_html = source["text_html"]
+
+    if highlighted_text:
+        text = highlighted_text[0].replace(MATCH_START, "").replace(MATCH_END, "")
+        offsets = match_offsets(highlighted_text[0])
+        text_html = highlight_html(text_html, text, offsets) or text_html
+
+    highlight["text_html"] = [text_html]
+    hit["highlight"] = highlight
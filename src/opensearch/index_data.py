@@ -1,30 +1,50 @@
+import functools
 import logging
+import resource
+import sys
 from logging import getLogger
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 from pathlib import Path
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from datetime import datetime
 
 from cpr_data_access.models import Dataset, BaseDocument, Span, GSTDocument, TextBlock
+from cpr_data_access.parser_models import ParserOutput
 from tqdm.auto import tqdm
 import pandas as pd
-from opensearchpy import helpers
+from opensearchpy import OpenSearch
 import click
 from dotenv import load_dotenv, find_dotenv
 import spacy
-from bs4 import BeautifulSoup, Tag
 
-from src.opensearch.client import get_opensearch_client
-from src.opensearch.index_settings import index_settings
+from src.opensearch.bulk import BulkIndexer, SpooledActions
+from src.opensearch.client import create_opensearch_client
+from src.opensearch.documents import FilterValues, passage_document_fields
+from src.opensearch.pipeline import (
+    StageThroughput,
+    check_failures,
+    map_in_order,
+)
+from src.opensearch.passage_html import cache_key as html_cache_key, spans_to_html
+from src.opensearch.index_settings import (
+    index_settings,
+    documents_index_settings,
+    with_date_index_sort,
+)
 from src.data.add_metadata import base_document_to_gst_document
 from src.data.scraper import load_scraper_csv
 from src import config
+from src.cache import DiskCache
 
 logging.basicConfig(level=logging.INFO)
 LOGGER = getLogger(__name__)
 
 nlp = spacy.blank("en")  # pipeline with tokenizer only
 
+# Cache of rendered passage HTML used by `text_block_to_html`. Set with
+# `set_html_cache` in the main process and in each conversion worker.
+html_cache: Optional[DiskCache] = None
+
 
 def load_spans_csv(path: Path) -> list[Span]:
     """
@@ -42,6 +62,68 @@ def load_spans_csv(path: Path) -> list[Span]:
     return [Span.parse_obj(row) for row in df.to_dict(orient="records")]
 
 
+def load_concept_spans(concepts_dir: Path) -> tuple[list[Span], dict[str, list[str]]]:
+    """
+    Load spans from each concept's subdirectory, and the concept filter values for the UI.
+
+    :param Path concepts_dir: path containing subdirectories for each concept, each containing a spans.csv file
+    :return tuple[list[Span], dict[str, list[str]]]: spans, concept name -> filter values
+    """
+    LOGGER.info("Loading spans from concepts directory")
+    spans = []
+    concept_filter_values = dict()
+
+    for path in concepts_dir.iterdir():
+        if path.is_file():
+            continue
+
+        spans_files = list(path.glob("spans*.csv"))
+        if len(spans_files) == 0:
+            LOGGER.info(
+                f"failed to find any spans.csv files in concepts subdirectory {path}"
+            )
+            continue
+
+        if path.name not in config.CONCEPTS_TO_INDEX:
+            LOGGER.info(
+                f"Skipping concept {path.name} because it is not in config CONCEPTS_TO_INDEX"
+            )
+            continue
+
+        concept_spans = []
+        for spans_file in spans_files:
+            concept_spans.extend(load_spans_csv(spans_file))
+
+        # Brackets can't be used in the Makefile so "br-" and "-br" are used to represent them
+        concept_name = (
+            path.name.replace("br-", "(").replace("-br", ")").replace("-", " ").title()
+        )
+
+        for span in concept_spans:
+            span.type = f"{concept_name} – {span.type.replace('_', ' ').title()}"
+
+        spans.extend(concept_spans)
+
+        # NOTE: the logic to add the "Concept – All" filter value is in the gst_document_to_opensearch_document function too.
+        concept_filter_values[concept_name] = [f"{concept_name} – All"] + sorted(
+            list(set([span.type for span in concept_spans]))
+        )
+
+        # Use 'annotator' property of spans to store whether the concept is a full-passage concept or not
+        if path.name in config.FULL_PASSAGE_CONCEPTS:
+            for span in concept_spans:
+                span.annotator = "full_passage"
+        elif path.name in config.PARTIAL_PASSAGE_CONCEPTS_TO_INDEX:
+            for span in concept_spans:
+                span.annotator = "partial_passage"
+        else:
+            raise ValueError(
+                f"Concept {path.name} not found in config. This means there's likely a bug in the indexing code."
+            )
+
+    return spans, OrderedDict(sorted(concept_filter_values.items()))
+
+
 def get_dataset_and_filter_values(
     parser_outputs_dir: Path,
     scraper_csv_path: Path,
@@ -51,6 +133,9 @@ def get_dataset_and_filter_values(
     """
     Get a Dataset object containing spans loaded from the concepts directory, and a dictionary of values to power UI filters.
 
+    This loads every document into memory at once. `iter_gst_documents` loads them one
+    at a time for indexing.
+
     :param Path parser_outputs_dir: path to directory containing parsed documents
     :param Path scraper_csv_path: path to scraper CSV file
     :param Path concepts_dir: path containing subdirectories for each concept, each containing a spans.csv file
@@ -98,65 +183,52 @@ def get_dataset_and_filter_values(
         dataset_metadata_df["types"].explode().unique().tolist()
     )
 
-    filter_values["concepts"] = dict()
-
-    LOGGER.info("Loading spans from concepts directory")
-    spans = []
+    spans, filter_values["concepts"] = load_concept_spans(concepts_dir)
 
-    for path in concepts_dir.iterdir():
-        if path.is_file():
-            continue
-
-        spans_files = list(path.glob("spans*.csv"))
-        if len(spans_files) == 0:
-            LOGGER.info(
-                f"failed to find any spans.csv files in concepts subdirectory {path}"
-            )
-            continue
+    LOGGER.info("Adding spans to dataset")
+    dataset.add_spans(spans, warn_on_error=False)
 
-        if path.name not in config.CONCEPTS_TO_INDEX:
-            LOGGER.info(
-                f"Skipping concept {path.name} because it is not in config CONCEPTS_TO_INDEX"
-            )
-            continue
+    return dataset, filter_values
 
-        concept_spans = []
-        for spans_file in spans_files:
-            concept_spans.extend(load_spans_csv(spans_file))
 
-        # Brackets can't be used in the Makefile so "br-" and "-br" are used to represent them
-        concept_name = (
-            path.name.replace("br-", "(").replace("-br", ")").replace("-", " ").title()
-        )
+def iter_gst_documents(
+    parser_outputs_dir: Path,
+    scraper_data: pd.DataFrame,
+    spans_by_document: dict[str, list[Span]],
+    limit: Optional[int] = None,
+) -> Iterator[GSTDocument]:
+    """
+    Load English parsed documents one at a time, with their metadata and spans added.
 
-        for span in concept_spans:
-            span.type = f"{concept_name} – {span.type.replace('_', ' ').title()}"
+    Only one document is held in memory at a time, unlike `get_dataset_and_filter_values`.
+    Documents which can't be matched to the scraper data are skipped with a warning.
 
-        spans.extend(concept_spans)
+    :param Path parser_outputs_dir: path to directory containing parsed documents
+    :param pd.DataFrame scraper_data: loaded using `src.data.load_scraper_csv`
+    :param dict[str, list[Span]] spans_by_document: document ID -> spans
+    :param Optional[int] limit: limit number of parsed documents read, defaults to None
+    :yield GSTDocument: documents with metadata and spans
+    """
+    paths = sorted(parser_outputs_dir.glob("*.json"))[:limit]
 
-        # NOTE: the logic to add the "Concept – All" filter value is in the gst_document_to_opensearch_document function too.
-        filter_values["concepts"][concept_name] = [f"{concept_name} – All"] + sorted(
-            list(set([span.type for span in concept_spans]))
-        )
+    for path in paths:
+        doc = BaseDocument.from_parser_output(ParserOutput.parse_file(path))
 
-        # Use 'annotator' property of spans to store whether the concept is a full-passage concept or not
-        if path.name in config.FULL_PASSAGE_CONCEPTS:
-            for span in concept_spans:
-                span.annotator = "full_passage"
-        elif path.name in config.PARTIAL_PASSAGE_CONCEPTS_TO_INDEX:
-            for span in concept_spans:
-                span.annotator = "partial_passage"
-        else:
-            raise ValueError(
-                f"Concept {path.name} not found in config. This means there's likely a bug in the indexing code."
-            )
+        # Same as `Dataset.filter_by_language("en")`
+        if doc.languages != ["en"]:
+            continue
 
-    filter_values["concepts"] = OrderedDict(sorted(filter_values["concepts"].items()))
+        try:
+            gst_doc = base_document_to_gst_document(doc, scraper_data)
+        except Exception as e:
+            LOGGER.warning(f"Could not process document {doc.document_id}: {e}")
+            continue
 
-    LOGGER.info("Adding spans to dataset")
-    dataset.add_spans(spans, warn_on_error=False)
+        gst_doc.add_spans(
+            spans_by_document.get(gst_doc.document_id, []), warn_on_error=False
+        )
 
-    return dataset, filter_values
+        yield gst_doc
 
 
 def fix_text_block_string(block_str: str) -> str:
@@ -175,77 +247,99 @@ def fix_text_block_string(block_str: str) -> str:
     )
 
 
+def set_html_cache(cache: Optional[DiskCache]) -> None:
+    """Set the cache of rendered passage HTML used by `text_block_to_html` in this process."""
+    global html_cache
+    html_cache = cache
+
+
 def text_block_to_html(block: TextBlock) -> str:
     """
     Convert a text block to HTML for the retool UI.
 
-    This uses displacy to generate the HTML, and then adds HTML classes and IDs to allow it to be styled.
+    Partial-passage spans are rendered with their concept labels, using HTML classes
+    and IDs which allow them to be styled. See `src.opensearch.passage_html`. If a
+    cache has been set with `set_html_cache`, HTML is reused for blocks whose text and
+    spans haven't changed.
 
     :param TextBlock block: text block
     :return str: html for display
     """
-
-    block_for_display = block.copy()
-    block_for_display._spans = [
-        span for span in block._spans if span.annotator != "full_passage"
+    spans = [
+        (span.start_idx, span.end_idx, span.type)
+        for span in block._spans
+        if span.annotator != "full_passage"
     ]
 
-    block_html = block_for_display.display(style="span", nlp=nlp).replace("</br>", " ")
-    soup = BeautifulSoup(block_html, "html.parser")
+    if html_cache is not None:
+        key = html_cache_key(block.text_hash, spans)
+        cached_html = html_cache.get(key)
 
-    def label_text_to_spans(text: str) -> tuple[Tag, Tag]:
-        """Convert label text e.g. 'Greenhouse Gases – Oil' to two HTML spans."""
+        if cached_html is not None:
+            return cached_html
 
-        concept, subconcept = [i.strip() for i in text.strip().split("–")]
+    text = block.to_string()
+    tokens = [(token.text, token.idx) for token in nlp.tokenizer(text)]
+    html = spans_to_html(text, tokens, spans)
 
-        concept_span = soup.new_tag("span")
-        concept_span.attrs["class"] = "concept-label"
-        concept_span.string = concept + " – "
+    if html_cache is not None:
+        html_cache.set(key, html)
 
-        subconcept_span = soup.new_tag("span")
-        subconcept_span.attrs["class"] = "subconcept-label"
-        subconcept_span.string = subconcept
+    return html
 
-        return concept_span, subconcept_span
 
-    for span in soup.find_all("span", {"style": lambda x: "z-index: 10" in x}):
-        span.attrs["class"] = "span-label"
-        span.attrs["id"] = span.text.strip()
-        span.parent.parent.attrs["class"] = (
-            "text-highlight" + " " + span.text.strip().replace(" ", "-")
-        )
-
-        concept_span, subconcept_span = label_text_to_spans(span.text)
-        span.string.replace_with("")
-        span.append(concept_span)
-        span.append(subconcept_span)
+def gst_document_to_document_source(doc: GSTDocument) -> dict:
+    """
+    Get the fields of a GSTDocument which describe the whole document, rather than one of its text blocks.
 
-    return soup.prettify()
+    :param GSTDocument doc: GST document
+    :return dict: document ID, name, metadata etc.
+    """
+    return doc.dict(
+        exclude={"text_blocks", "page_metadata", "_text_block_idx_hash_map"}
+    )
 
 
-def gst_document_to_opensearch_document(doc: GSTDocument) -> list[dict]:
+def gst_document_to_opensearch_document(
+    doc: GSTDocument,
+    normalise_documents: bool = False,
+    neighbour_text: bool = True,
+) -> list[dict]:
     """
     Convert a GSTDocument object to a list of documents to load into OpenSearch.
 
     :param GSTDocument doc: GST document
+    :param bool normalise_documents: only include the fields from
+        `src.opensearch.documents.passage_document_fields` in each passage, rather than
+        all of the document's fields. The document is then indexed separately.
+    :param bool neighbour_text: include the text of the previous and next blocks in
+        each passage. Without it, the API fetches neighbouring blocks by
+        `block_index` when asked. See `src.opensearch.neighbours`.
     :return list[dict]: list of OpenSearch documents
     """
     if not doc.text_blocks:
         return []
 
     opensearch_docs = []
-    doc_dict = doc.dict(
-        exclude={"text_blocks", "page_metadata", "_text_block_idx_hash_map"}
-    )
+    doc_dict = gst_document_to_document_source(doc)
 
-    for idx, block in enumerate(doc.text_blocks):
-        block_before_text = "" if idx == 0 else doc.text_blocks[idx - 1].to_string()
+    if normalise_documents:
+        doc_dict = passage_document_fields(doc_dict)
 
-        block_after_text = (
-            ""
-            if idx == len(doc.text_blocks) - 1
-            else doc.text_blocks[idx + 1].to_string()
-        )
+    for idx, block in enumerate(doc.text_blocks):
+        neighbours = {}
+
+        if neighbour_text:
+            block_before_text = "" if idx == 0 else doc.text_blocks[idx - 1].to_string()
+            block_after_text = (
+                ""
+                if idx == len(doc.text_blocks) - 1
+                else doc.text_blocks[idx + 1].to_string()
+            )
+            neighbours = {
+                "text_before": fix_text_block_string(block_before_text),
+                "text_after": fix_text_block_string(block_after_text),
+            }
 
         span_types = list(set([s.type for s in block._spans]))
         span_types_full_passage = list(
@@ -268,9 +362,8 @@ def gst_document_to_opensearch_document(doc: GSTDocument) -> list[dict]:
             )
             | {
                 "type": block.type.value,
-                "text_before": fix_text_block_string(block_before_text),
+                "block_index": idx,
                 "text": fix_text_block_string(block.to_string()),
-                "text_after": fix_text_block_string(block_after_text),
                 "text_html": text_block_to_html(block),
                 "spans": [s.dict() for s in block._spans],
                 "span_types": span_types,
@@ -281,11 +374,87 @@ def gst_document_to_opensearch_document(doc: GSTDocument) -> list[dict]:
                 if doc.document_metadata.date
                 else None,
             }
+            | neighbours
         )
 
     return opensearch_docs
 
 
+def convert_documents(
+    docs: Iterable[GSTDocument],
+    workers: int = 1,
+    window: Optional[int] = None,
+    **kwargs,
+) -> Iterator[list[dict]]:
+    """
+    Convert documents with `gst_document_to_opensearch_document`, in a pool of processes if `workers` is more than one.
+
+    Results are yielded in the same order as `docs`, as soon as each is ready, so they
+    can be indexed while later documents are still being converted. At most `window`
+    documents are read from `docs` ahead of the one being yielded, so memory doesn't
+    grow with the size of the dataset. See `src.opensearch.pipeline.map_in_order`.
+
+    :param Iterable[GSTDocument] docs: GST documents. Read lazily.
+    :param int workers: number of processes to convert documents in
+    :param Optional[int] window: most documents to have in the pool at once, defaults
+        to `src.opensearch.pipeline.CONVERSION_WINDOW_PER_WORKER` per worker
+    :param kwargs: passed to `gst_document_to_opensearch_document`
+    :return Iterator[list[dict]]: OpenSearch documents for each GST document
+    """
+    # Workers use the same HTML cache as this process, and share its hit counts
+    return map_in_order(
+        functools.partial(gst_document_to_opensearch_document, **kwargs),
+        docs,
+        workers=workers,
+        window=window,
+        initializer=set_html_cache,
+        initargs=(html_cache,),
+    )
+
+
+def bulk_index(
+    opns: OpenSearch, index: str, docs: Iterable[dict], **kwargs
+) -> BulkIndexer:
+    """
+    Index documents with the bulk API, from several threads.
+
+    :param OpenSearch opns: OpenSearch client
+    :param str index: index name
+    :param Iterable[dict] docs: documents to index. They can be produced lazily, in
+        which case the time taken includes producing them.
+    :param kwargs: passed to `BulkIndexer`
+    :return BulkIndexer: indexer with counts of documents indexed and failed, and the
+        time taken
+    """
+    indexer = BulkIndexer(opns, index, **kwargs)
+
+    return indexer.index_actions(tqdm(docs, unit="docs"))
+
+
+def index_size_bytes(opns: OpenSearch, index: str) -> int:
+    """Get the size on disk of an index's primary shards, after refreshing it."""
+    opns.indices.refresh(index=index)
+    stats = opns.indices.stats(index=index, metric="store")
+
+    return stats["_all"]["primaries"]["store"]["size_in_bytes"]
+
+
+def peak_memory_mb() -> tuple[float, float]:
+    """
+    Get the peak resident memory of this process and of its finished child processes.
+
+    :return tuple[float, float]: peak memory of this process, and of the largest child
+        process, in MB
+    """
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    scale = 1024**2 if sys.platform == "darwin" else 1024
+
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    )
+
+
 @click.command()
 @click.argument(
     "parser_outputs_dir", type=click.Path(exists=True, file_okay=False, path_type=Path)
@@ -298,45 +467,241 @@ def gst_document_to_opensearch_document(doc: GSTDocument) -> list[dict]:
 )
 @click.option("--index-prefix", "-i", type=str, default="global-stocktake")
 @click.option("--limit", "-l", type=int, default=None)
-def main(parser_outputs_dir, scraper_csv_path, concepts_dir, index_prefix, limit):
+@click.option(
+    "--sort-by-date",
+    is_flag=True,
+    default=False,
+    help="Sort the index by document date, newest first. Set SEARCH_INDEX_SORTED_BY_DATE for the API to make use of it.",
+)
+@click.option(
+    "--normalise-documents",
+    is_flag=True,
+    default=False,
+    help="Index document metadata once in a separate documents index rather than in every passage. Set SEARCH_NORMALISED_DOCUMENTS for the API to make use of it.",
+)
+@click.option(
+    "--no-neighbour-text",
+    is_flag=True,
+    default=False,
+    help="Don't store the text of the previous and next blocks in each passage. The API fetches them when a search asks for neighbours.",
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=int,
+    default=1,
+    help="Number of processes to convert documents to OpenSearch documents in",
+)
+@click.option(
+    "--bulk-threads",
+    type=int,
+    default=4,
+    help="Number of bulk requests to send at once",
+)
+@click.option(
+    "--chunk-size", type=int, default=500, help="Most documents in one bulk request"
+)
+@click.option(
+    "--max-chunk-mb",
+    type=float,
+    default=10,
+    help="Most data in one bulk request, in MB before compression",
+)
+@click.option(
+    "--max-retries",
+    type=int,
+    default=5,
+    help="Times to retry documents the cluster is too busy to index",
+)
+@click.option(
+    "--max-failed",
+    type=int,
+    default=0,
+    help="Most documents which can fail to index before the run fails, without indexing the filter values that make the index usable",
+)
+@click.option(
+    "--dead-letter-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=Path("."),
+    help="Directory to write documents which failed to index to, as <index>-failed.ndjson",
+)
+@click.option(
+    "--html-cache-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Directory to cache rendered passage HTML in between runs. Blocks whose text and spans haven't changed aren't rendered again.",
+)
+@click.option(
+    "--html-cache-max-mb",
+    type=float,
+    default=2048,
+    help="Size to keep the passage HTML cache within, removing the least recently used HTML at the end of a run",
+)
+@click.option(
+    "--no-http-compress",
+    is_flag=True,
+    default=False,
+    help="Don't gzip bulk requests",
+)
+def main(
+    parser_outputs_dir,
+    scraper_csv_path,
+    concepts_dir,
+    index_prefix,
+    limit,
+    sort_by_date,
+    normalise_documents,
+    no_neighbour_text,
+    workers,
+    bulk_threads,
+    chunk_size,
+    max_chunk_mb,
+    max_retries,
+    max_failed,
+    dead_letter_dir,
+    html_cache_dir,
+    html_cache_max_mb,
+    no_http_compress,
+):
     load_dotenv(find_dotenv())
 
     timestr = datetime.now().strftime("%Y%m%d-%H%M%S")
     index_name = f"{index_prefix}-{timestr}"
 
     """Load dataset and index into OpenSearch."""
-    opns = get_opensearch_client()
+    opns = create_opensearch_client(http_compress=not no_http_compress)
+    dead_letter_dir.mkdir(parents=True, exist_ok=True)
+
+    if html_cache_dir is not None:
+        set_html_cache(DiskCache(html_cache_dir, int(html_cache_max_mb * 1024**2)))
+    bulk_kwargs = dict(
+        threads=bulk_threads,
+        chunk_size=chunk_size,
+        max_chunk_bytes=int(max_chunk_mb * 1024**2),
+        max_retries=max_retries,
+    )
 
     LOGGER.info(f"Creating index {index_name}")
-    opns.indices.create(index=index_name, body=index_settings)
+    opns.indices.create(
+        index=index_name,
+        body=with_date_index_sort(index_settings) if sort_by_date else index_settings,
+    )
 
-    dataset, filter_values = get_dataset_and_filter_values(
-        parser_outputs_dir, scraper_csv_path, concepts_dir, limit
+    LOGGER.info("Loading scraper CSV")
+    scraper_data = load_scraper_csv(scraper_csv_path)
+    spans, concept_filter_values = load_concept_spans(concepts_dir)
+
+    spans_by_document = defaultdict(list)
+    for span in spans:
+        spans_by_document[span.document_id].append(span)
+    del spans
+
+    filter_values = FilterValues(concept_filter_values)
+    # Written to disk as documents are loaded, and indexed once the passages are, so
+    # memory doesn't grow with the number of documents
+    document_sources = SpooledActions()
+
+    def collect_metadata(docs: Iterable[GSTDocument]) -> Iterator[GSTDocument]:
+        """Record each document's filter values, and its metadata if it's indexed separately."""
+        for doc in docs:
+            filter_values.add(doc)
+
+            if normalise_documents:
+                document_sources.add(
+                    gst_document_to_document_source(doc) | {"_id": doc.document_id}
+                )
+
+            yield doc
+
+    # Each stage pulls one document at a time from the one before, so only the
+    # documents in the conversion window are held in memory. Passages are sent to the
+    # bulk loader as soon as their document has been converted, while the worker
+    # processes convert the next documents.
+    LOGGER.info(f"Loading, converting and indexing documents with {workers} worker(s)")
+    loading = StageThroughput("load", "documents")
+    conversion = StageThroughput("convert", "documents", upstream=loading)
+    loaded_docs = loading.wrap(
+        collect_metadata(
+            iter_gst_documents(
+                parser_outputs_dir, scraper_data, spans_by_document, limit
+            )
+        )
     )
+    converted_docs = conversion.wrap(
+        convert_documents(
+            loaded_docs,
+            workers=workers,
+            normalise_documents=normalise_documents,
+            neighbour_text=not no_neighbour_text,
+        )
+    )
+    opns_docs = (opns_doc for passages in converted_docs for opns_doc in passages)
+
+    passages = bulk_index(
+        opns,
+        index_name,
+        opns_docs,
+        dead_letter_path=dead_letter_dir / f"{index_name}-failed.ndjson",
+        **bulk_kwargs,
+    )
+    LOGGER.info(loading.summary())
+    LOGGER.info(conversion.summary())
+
+    if html_cache is not None:
+        html_cache.evict()
+        stats = html_cache.stats()
+        LOGGER.info(
+            f"HTML cache: {stats['hits']} hits, {stats['misses']} misses ({100 * stats['hit_rate']:.1f}% hit rate), {stats['evictions']} evicted"
+        )
 
-    LOGGER.info("Converting documents to OpenSearch documents")
-    opns_docs = []
-    for doc in tqdm(dataset.documents):
-        opns_docs.extend(gst_document_to_opensearch_document(doc))  # type: ignore
+    LOGGER.info(
+        f"bulk: {passages.summary()}, {passages.seconds - conversion.seconds:.1f}s waiting for requests"
+    )
 
-    LOGGER.info("Indexing documents")
-    actions = tqdm(opns_docs, unit="docs")
-    successes = 0
+    report = [
+        f"passages: {passages.docs} docs in {passages.seconds:.1f}s, {index_size_bytes(opns, index_name) / 1024**2:.1f} MB"
+    ]
 
-    for ok, _ in helpers.streaming_bulk(
-        client=opns,
-        index=index_name,
-        actions=actions,
-        request_timeout=60,
-        max_retries=5,
-    ):
-        successes += ok
+    if normalise_documents:
+        documents_index = index_name + "-documents"
+        LOGGER.info(f"Indexing document metadata to index {documents_index}")
+        opns.indices.create(index=documents_index, body=documents_index_settings)
+
+        documents = bulk_index(
+            opns,
+            documents_index,
+            document_sources,
+            dead_letter_path=dead_letter_dir / f"{documents_index}-failed.ndjson",
+            **bulk_kwargs,
+        )
+        LOGGER.info(f"bulk: {documents.summary()}")
+        report.append(
+            f"documents: {documents.docs} docs in {documents.seconds:.1f}s, {index_size_bytes(opns, documents_index) / 1024**2:.1f} MB"
+        )
+
+    document_sources.close()
+
+    layout = "normalised" if normalise_documents else "denormalised"
+    LOGGER.info(f"Indexed with {layout} document metadata. " + "; ".join(report))
+
+    # The metadata index is written last, so an index missing documents isn't left
+    # looking complete
+    check_failures(
+        [passages] + ([documents] if normalise_documents else []), max_failed
+    )
 
     LOGGER.info(f"Indexing metadata to index {index_name+'-metadata'}")
-    opns.index(index=index_name + "-metadata", body=filter_values, id="filters")
+    opns.index(
+        index=index_name + "-metadata", body=filter_values.to_dict(), id="filters"
+    )
 
     LOGGER.info(f"New index names: {index_name}, {index_name+'-metadata'}")
 
+    self_mb, children_mb = peak_memory_mb()
+    LOGGER.info(
+        f"Peak memory: {self_mb:.0f} MB in the main process, {children_mb:.0f} MB in the largest worker"
+    )
+
 
 if __name__ == "__main__":
     main()
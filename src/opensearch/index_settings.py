@@ -1,9 +1,12 @@
+import copy
+
 SEARCHABLE_FIELDS = {"text"}
 HTML_FIELDS = {"text_html"}
 KEYWORD_FIELDS = {
     "id",
     "type",
     "document_id",
+    "text_block_id",
     "span_ids",
     "span_types",
     "document_metadata.link",
@@ -16,8 +19,70 @@ KEYWORD_FIELDS = {
     "document_metadata.types",
 }
 BOOLEAN_FIELDS = {"is_party"}
+INTEGER_FIELDS = {"block_index"}
 DATE_FIELDS = {"document_metadata.date"}
 
+# Fields which are only returned for display, never searched, filtered, sorted or
+# aggregated on. They're kept in _source but not indexed, and have no doc values.
+DISPLAY_ONLY_FIELDS = {
+    "text": {"text_before", "text_after"},
+    "keyword": {
+        "document_name",
+        "document_source_url",
+        "document_content_type",
+        "document_md5_sum",
+        "languages",
+        "language",
+        "date_string",
+        "span_types_full_passage",
+    },
+    "float": {"type_confidence", "coords"},
+    "integer": {"page_number"},
+    "boolean": {"translated", "has_valid_text"},
+}
+# Objects which are only returned for display. None of their fields are parsed.
+DISPLAY_ONLY_OBJECTS = {"spans"}
+# Objects whose fields vary with the source data, so that fields not mapped here are
+# kept in _source without being indexed, rather than rejected.
+OPEN_OBJECTS = {"document_metadata"}
+
+# Index-time sort for indices built with `with_date_index_sort`: newest first, then the
+# unique key of each passage so that the order is total.
+DATE_INDEX_SORT = [
+    ("document_metadata.date", "desc"),
+    ("document_id", "asc"),
+    ("text_block_id", "asc"),
+]
+
+
+def nest_properties(properties: dict[str, dict]) -> dict[str, dict]:
+    """
+    Convert a mapping of dotted field names to nested object mappings.
+
+    Objects in `OPEN_OBJECTS` keep fields which aren't mapped without indexing them.
+
+    :param dict[str, dict] properties: dotted field name -> field mapping, e.g.
+        {"document_metadata.date": {"type": "date"}}
+    :return dict[str, dict]: mapping properties, e.g.
+        {"document_metadata": {"properties": {"date": {"type": "date"}}}}
+    """
+    nested: dict[str, dict] = {}
+
+    for field, mapping in properties.items():
+        *parents, name = field.split(".")
+        level = nested
+
+        for parent in parents:
+            obj = level.setdefault(parent, {"properties": {}})
+            if parent in OPEN_OBJECTS:
+                obj["dynamic"] = False
+            level = obj["properties"]
+
+        level[name] = mapping
+
+    return nested
+
+
 index_settings = {
     "settings": {
         "index": {"number_of_shards": 1},
@@ -36,14 +101,14 @@ index_settings = {
                     "tokenizer": "standard",
                     "filter": ["lowercase", "ascii_folding_preserve_original"],
                 },
-                "ignore_html_tags": {
+                # Same as folding, with English stemming
+                "folding_stemmed": {
                     "tokenizer": "standard",
                     "filter": [
                         "lowercase",
                         "ascii_folding_preserve_original",
                         "filter_stemmer",
                     ],
-                    "char_filter": ["html_strip"],
                 },
             },
             # This normalizer does the same as the folding analyser, but is used for keyword fields.
@@ -57,19 +122,73 @@ index_settings = {
         },
     },
     "mappings": {
-        "properties": {
-            field: {"type": "text", "analyzer": "folding"}
-            for field in SEARCHABLE_FIELDS
-        }
-        | {
-            field: {"type": "keyword", "normalizer": "folding"}
-            for field in KEYWORD_FIELDS
-        }
-        | {
-            field: {"type": "text", "analyzer": "ignore_html_tags"}
-            for field in HTML_FIELDS
-        }
-        | {field: {"type": "boolean"} for field in BOOLEAN_FIELDS}
-        | {field: {"type": "date"} for field in DATE_FIELDS},
+        # Every field is mapped explicitly, and other fields are kept in the source
+        # without being indexed, so that nothing is indexed by dynamic mapping
+        # without being used. They aren't rejected ("strict"), as one field the
+        # converter adds which isn't mapped here would fail every passage.
+        "dynamic": False,
+        "properties": nest_properties(
+            # Searchable fields store offsets, so that matches can be highlighted
+            # from the index without re-analysing the text. See
+            # `src.opensearch.highlight`.
+            {
+                field: {
+                    "type": "text",
+                    "analyzer": "folding_stemmed",
+                    "index_options": "offsets",
+                }
+                for field in SEARCHABLE_FIELDS
+            }
+            | {
+                field: {"type": "keyword", "normalizer": "folding"}
+                for field in KEYWORD_FIELDS
+            }
+            # HTML is only displayed: matches are highlighted in it from `text`
+            | {field: {"type": "text", "index": False} for field in HTML_FIELDS}
+            | {field: {"type": "boolean"} for field in BOOLEAN_FIELDS}
+            | {field: {"type": "integer"} for field in INTEGER_FIELDS}
+            | {field: {"type": "date"} for field in DATE_FIELDS}
+            | {
+                field: {"type": field_type, "index": False}
+                | ({} if field_type == "text" else {"doc_values": False})
+                for field_type, fields in DISPLAY_ONLY_FIELDS.items()
+                for field in fields
+            }
+            | {
+                field: {"type": "object", "enabled": False}
+                for field in DISPLAY_ONLY_OBJECTS
+            }
+        ),
     },
 }
+
+# Settings for the documents index built by `index_data.py --normalise-documents`.
+# Documents are only fetched by ID to add their metadata to search results, so none of
+# their fields are indexed.
+documents_index_settings = {
+    "settings": {"index": {"number_of_shards": 1}},
+    "mappings": {"enabled": False},
+}
+
+
+def with_date_index_sort(settings: dict) -> dict:
+    """
+    Get a copy of index settings with index-time sorting by `DATE_INDEX_SORT`.
+
+    Segments are stored in date order, so searches sorted newest first can stop
+    collecting on each shard once they have enough hits. Index sorting can't be
+    changed once an index is created, and makes indexing slower.
+
+    :param dict settings: index settings and mappings, e.g. `index_settings`
+    :return dict: index settings with index sorting
+    """
+    sorted_settings = copy.deepcopy(settings)
+    sorted_settings["settings"]["index"].update(
+        {
+            "sort.field": [field for field, _ in DATE_INDEX_SORT],
+            "sort.order": [order for _, order in DATE_INDEX_SORT],
+            "sort.missing": ["_last"] * len(DATE_INDEX_SORT),
+        }
+    )
+
+    return sorted_settings
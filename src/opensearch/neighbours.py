@@ -0,0 +1,105 @@
+"""
+Fetching the text of the blocks either side of search results.
+
+Indices built with `index_data.py --no-neighbour-text` don't store `text_before` and
+`text_after` in every passage. When a search asks for neighbours, the blocks either
+side of every hit on the page are fetched in one search on `document_id` and
+`block_index`, and their text is added to the hits.
+"""
+
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from opensearchpy import OpenSearch
+
+from src.opensearch.client import run_in_executor
+from src.opensearch.documents import all_hits
+
+
+def neighbours_query(hits: Iterable[dict]) -> Optional[dict]:
+    """
+    Build a query for the blocks before and after each hit.
+
+    Hits which already have neighbour text, or no block index, are skipped.
+
+    :param Iterable[dict] hits: OpenSearch hits
+    :return Optional[dict]: OpenSearch query body, or None if no blocks are needed
+    """
+    block_indices: dict[str, set[int]] = defaultdict(set)
+
+    for hit in hits:
+        source = hit.get("_source", {})
+
+        if "text_before" in source or "block_index" not in source:
+            continue
+
+        block_indices[source["document_id"]].update(
+            [source["block_index"] - 1, source["block_index"] + 1]
+        )
+
+    if not block_indices:
+        return None
+
+    return {
+        "size": sum(len(indices) for indices in block_indices.values()),
+        "_source": ["document_id", "block_index", "text"],
+        "query": {
+            "bool": {
+                "should": [
+                    {
+                        "bool": {
+                            "filter": [
+                                {"term": {"document_id": document_id}},
+                                {"terms": {"block_index": sorted(indices)}},
+                            ]
+                        }
+                    }
+                    for document_id, indices in block_indices.items()
+                ],
+                "minimum_should_match": 1,
+            }
+        },
+    }
+
+
+def add_neighbour_text(hits: Iterable[dict], neighbour_hits: Iterable[dict]) -> None:
+    """
+    Add `text_before` and `text_after` to hits from the results of `neighbours_query`.
+
+    The first and last blocks of a document get an empty string, as when neighbour
+    text is indexed.
+    """
+    texts = {
+        (hit["_source"]["document_id"], hit["_source"]["block_index"]): hit[
+            "_source"
+        ].get("text", "")
+        for hit in neighbour_hits
+    }
+
+    for hit in hits:
+        source = hit.get("_source", {})
+
+        if "text_before" in source or "block_index" not in source:
+            continue
+
+        document_id, block_index = source["document_id"], source["block_index"]
+        source["text_before"] = texts.get((document_id, block_index - 1), "")
+        source["text_after"] = texts.get((document_id, block_index + 1), "")
+
+
+async def add_neighbours(opns: OpenSearch, index: str, hits: Iterable[dict]) -> None:
+    """
+    Fetch the blocks either side of each hit, and add their text to the hits.
+
+    :param OpenSearch opns: OpenSearch client
+    :param str index: concrete index name(s) the hits are from
+    :param Iterable[dict] hits: OpenSearch hits, which are changed in place
+    """
+    hits = all_hits(hits)
+    query_body = neighbours_query(hits)
+
+    if query_body is None:
+        return
+
+    result = await run_in_executor(opns.search, index=index, body=query_body)
+    add_neighbour_text(hits, result["hits"]["hits"])
@@ -0,0 +1,217 @@
+"""
+Rendering passage text with its concept spans as HTML for the UI.
+
+Passages used to be rendered with spaCy's displacy span visualiser, then reparsed
+with BeautifulSoup to add classes and IDs to the labels, then pretty-printed. This
+builds the same markup directly from span offsets in one pass over the tokens, as
+plain strings.
+
+The output is identical to the old renderer's (including the pretty-printing), so
+passages rendered either way can be mixed in one index. The one exception is text in
+spans which looks like markup, e.g. "<b>", which displacy didn't escape and so was
+parsed as tags.
+
+The structure for a token with a span starting on it is:
+
+    <span class="text-highlight {label}" style="...">     one per token in a span
+     {token}
+     <span style="..."></span>                             a bar per span on the token
+     <span style="...">                                   a label per span starting here
+      <span class="span-label" id="{concept} – {subconcept}" style="...">
+       <span class="concept-label">{concept} –</span>
+       <span class="subconcept-label">{subconcept}</span>
+      </span>
+     </span>
+    </span>
+
+Tokens with no spans are plain text, separated by spaces as in displacy's output.
+"""
+
+import hashlib
+import json
+from bisect import bisect_right
+from typing import Iterable, Sequence
+
+# Change this when the markup changes, so that cached HTML isn't used
+RENDER_VERSION = 1
+
+# displacy's styles and layout, in pixels
+SPANS_STYLE = "line-height: 2.5; direction: ltr"
+SPAN_COLOUR = "#ddd"
+TOP_OFFSET = 40
+SPAN_LABEL_OFFSET = 20
+OFFSET_STEP = 17
+
+TOKEN_STYLE = (
+    "font-weight: bold; display: inline-block; position: relative; height: {height}px;"
+)
+SLICE_STYLE = "background: {colour}; top: {top}px; height: 4px; left: -1px; width: calc(100% + 2px); position: absolute;"
+START_STYLE = "background: {colour}; top: {top}px; height: 4px; border-top-left-radius: 3px; border-bottom-left-radius: 3px; left: -1px; width: calc(100% + 2px); position: absolute;"
+LABEL_STYLE = "background: {colour}; z-index: 10; color: #000; top: -0.5em; padding: 2px 3px; position: absolute; font-size: 0.6em; font-weight: bold; line-height: 1; border-radius: 3px"
+
+
+def escape_text(text: str) -> str:
+    """Escape text as BeautifulSoup's minimal formatter does."""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def quote_attribute(value: str) -> str:
+    """Escape and quote an attribute value as BeautifulSoup does."""
+    value = escape_text(value)
+
+    if '"' not in value:
+        return f'"{value}"'
+    if "'" not in value:
+        return f"'{value}'"
+
+    return '"' + value.replace('"', "&quot;") + '"'
+
+
+def char_to_token_index(token_starts: Sequence[int], text_length: int, idx: int) -> int:
+    """
+    Get the index of the token containing a character.
+
+    :param Sequence[int] token_starts: character offset of the start of each token
+    :param int text_length: length of the text
+    :param int idx: character offset
+    :raises ValueError: if `idx` is outside the text
+    :return int: token index
+    """
+    if idx < 0:
+        raise ValueError("Character index must be positive.")
+
+    if idx > text_length:
+        raise ValueError(
+            "Character index must be less than the length of the document."
+        )
+
+    return max(bisect_right(token_starts, idx) - 1, 0)
+
+
+def spans_to_html(
+    text: str,
+    tokens: Sequence[tuple[str, int]],
+    spans: Iterable[tuple[int, int, str]],
+) -> str:
+    """
+    Render text with labelled spans as HTML.
+
+    Spans are extended to whole tokens. The token containing a span's end offset is
+    part of the span.
+
+    :param str text: passage text
+    :param Sequence[tuple[str, int]] tokens: text and start offset of each token of
+        `text`, from spaCy's English tokenizer
+    :param Iterable[tuple[int, int, str]] spans: start offset, end offset and label
+        of each span. Labels are "{concept} – {subconcept}".
+    :raises ValueError: if a span's offsets are outside the text, or its label isn't
+        in two parts
+    :return str: HTML
+    """
+    token_starts = [start for _, start in tokens]
+    token_spans = sorted(
+        (
+            (
+                char_to_token_index(token_starts, len(text), start_idx),
+                char_to_token_index(token_starts, len(text), end_idx) + 1,
+                label,
+            )
+            for start_idx, end_idx, label in spans
+        ),
+        # Longer spans are stacked above shorter ones starting at the same token
+        key=lambda span: (span[0], -(span[1] - span[0]), span[2]),
+    )
+
+    output = [f'<div class="spans" style="{SPANS_STYLE}">\n']
+    plain_text: list[str] = []
+    # Spans covering the current token, in the order above, with their render slots
+    active: list[list] = []
+    next_span = 0
+
+    def flush_plain_text() -> None:
+        run = "".join(plain_text).strip()
+        if run:
+            output.append(f" {escape_text(run)}\n")
+        plain_text.clear()
+
+    for idx, (token, _) in enumerate(tokens):
+        active = [span for span in active if span[1] > idx]
+
+        # A span's render slot is the number of spans covering its first token, up
+        # to and including itself
+        while next_span < len(token_spans) and token_spans[next_span][0] <= idx:
+            start, end, label = token_spans[next_span]
+            if end > idx:
+                active.append([start, end, label, 0])
+            next_span += 1
+
+        for position, span in enumerate(active):
+            if span[0] == idx:
+                span[3] = position + 1
+
+        if not active or token.strip() == "":
+            plain_text.append(token + " ")
+            continue
+
+        flush_plain_text()
+        starting = [span for span in active if span[0] == idx]
+        height = TOP_OFFSET + SPAN_LABEL_OFFSET + OFFSET_STEP * (len(active) - 1)
+        token_style = TOKEN_STYLE.format(height=height)
+
+        if starting:
+            # The last label starting on a token names its class
+            css_class = "text-highlight " + starting[-1][2].strip().replace(" ", "-")
+            output.append(
+                f" <span class={quote_attribute(css_class)} style={quote_attribute(token_style)}>\n"
+            )
+        else:
+            output.append(f" <span style={quote_attribute(token_style)}>\n")
+
+        output.append(f"  {escape_text(token.strip())}\n")
+
+        for span in active:
+            top = TOP_OFFSET + OFFSET_STEP * (span[3] - 1)
+            style = SLICE_STYLE.format(colour=SPAN_COLOUR, top=top)
+            output.append(f"  <span style={quote_attribute(style)}>\n  </span>\n")
+
+        for span in starting:
+            label = span[2].strip()
+            concept, subconcept = [part.strip() for part in label.split("–")]
+            top = TOP_OFFSET + OFFSET_STEP * (span[3] - 1)
+            start_style = START_STYLE.format(colour=SPAN_COLOUR, top=top)
+            label_style = LABEL_STYLE.format(colour=SPAN_COLOUR)
+
+            output.append(
+                f"  <span style={quote_attribute(start_style)}>\n"
+                f'   <span class="span-label" id={quote_attribute(label)} style={quote_attribute(label_style)}>\n'
+                '    <span class="concept-label">\n'
+                f"     {escape_text((concept + ' –').strip())}\n"
+                "    </span>\n"
+                '    <span class="subconcept-label">\n'
+                + (f"     {escape_text(subconcept)}\n" if subconcept else "")
+                + "    </span>\n"
+                + "   </span>\n"
+                "  </span>\n"
+            )
+
+        output.append(" </span>\n")
+
+    flush_plain_text()
+    output.append("</div>\n")
+
+    return "".join(output)
+
+
+def cache_key(text_hash: str, spans: Iterable[tuple[int, int, str]]) -> str:
+    """
+    Get a key for caching the HTML of a block from its text's hash and its spans.
+
+    :param str text_hash: hash of the block's text, as in spans'
+        `text_block_text_hash`
+    :param Iterable[tuple[int, int, str]] spans: spans as passed to `spans_to_html`,
+        in any order
+    :return str: hex digest
+    """
+    content = json.dumps([RENDER_VERSION, text_hash, sorted(spans)], ensure_ascii=False)
+
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
@@ -0,0 +1,165 @@
+"""
+Stages of the indexing pipeline which don't depend on the document models.
+
+`src.opensearch.index_data` chains loading, converting and bulk indexing documents as
+generators, so only a few documents are in memory at once. This module has the
+generic parts: converting items in order in a pool of processes, timing each stage,
+and checking the bulk indexers' failures at the end of a run.
+"""
+
+import logging
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+import click
+
+from src.opensearch.bulk import BulkIndexer
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Items queued for conversion per worker process, so workers don't wait for work
+# while the main process is sending a bulk request
+CONVERSION_WINDOW_PER_WORKER = 4
+
+
+class StageThroughput:
+    """
+    Counts items produced by one stage of the indexing pipeline, and the time spent producing them.
+
+    Stages are chained as generators, so the time for a stage is the time spent
+    waiting for its next item. Progress is logged every `log_interval` seconds.
+
+    :param str name: stage name for logs
+    :param str unit: what the items are, e.g. "documents"
+    :param float log_interval: seconds between progress logs
+    :param Optional[StageThroughput] upstream: stage this one pulls its input from,
+        whose time is excluded from this stage's summary
+    """
+
+    def __init__(
+        self,
+        name: str,
+        unit: str,
+        log_interval: float = 30,
+        upstream: Optional["StageThroughput"] = None,
+    ):
+        self.name = name
+        self.unit = unit
+        self.log_interval = log_interval
+        self.upstream = upstream
+        self.count = 0
+        self.seconds = 0.0
+
+    @property
+    def own_seconds(self) -> float:
+        """Time spent in this stage, excluding time waiting for its upstream stage."""
+        if self.upstream is None:
+            return self.seconds
+
+        return max(self.seconds - self.upstream.seconds, 0.0)
+
+    def wrap(self, items: Iterable[T]) -> Iterator[T]:
+        """Yield items from `items`, timing how long each takes to produce."""
+        iterator = iter(items)
+        last_log = time.perf_counter()
+
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                self.seconds += time.perf_counter() - start
+
+            self.count += 1
+            yield item
+
+            if time.perf_counter() - last_log > self.log_interval:
+                LOGGER.info(self.summary())
+                last_log = time.perf_counter()
+
+    def summary(self) -> str:
+        """Describe the stage's throughput so far."""
+        seconds = self.own_seconds
+        rate = self.count / seconds if seconds else 0
+
+        return f"{self.name}: {self.count} {self.unit} in {seconds:.1f}s ({rate:.1f} {self.unit}/s)"
+
+
+def map_in_order(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    workers: int = 1,
+    window: Optional[int] = None,
+    initializer: Optional[Callable[..., None]] = None,
+    initargs: tuple = (),
+) -> Iterator[R]:
+    """
+    Apply `func` to each item, in a pool of processes if `workers` is more than one.
+
+    Results are yielded in the same order as `items`, as soon as each is ready, so
+    they can be used while later items are still being processed. At most `window`
+    items are read from `items` ahead of the one being yielded, so memory doesn't grow
+    with the number of items.
+
+    :param Callable[[T], R] func: function to apply. Must be picklable if `workers` is
+        more than one.
+    :param Iterable[T] items: items. Read lazily.
+    :param int workers: number of processes to apply `func` in
+    :param Optional[int] window: most items to have in the pool at once, defaults to
+        `CONVERSION_WINDOW_PER_WORKER` per worker
+    :param Optional[Callable[..., None]] initializer: called with `initargs` in each
+        worker process when it starts
+    :param tuple initargs: arguments for `initializer`
+    :yield R: result for each item
+    """
+    if workers <= 1:
+        yield from map(func, items)
+        return
+
+    window = window or workers * CONVERSION_WINDOW_PER_WORKER
+
+    # `multiprocessing.Pool.imap` reads its whole input ahead of the results, so
+    # items are submitted one at a time as earlier results are taken instead
+    with ProcessPoolExecutor(
+        workers, initializer=initializer, initargs=initargs
+    ) as executor:
+        pending = deque()
+
+        for item in items:
+            pending.append(executor.submit(func, item))
+
+            if len(pending) >= window:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def check_failures(indexers: Iterable[BulkIndexer], max_failed: int) -> None:
+    """
+    Log the documents each indexer failed to index, and fail the run if there are too many.
+
+    :param Iterable[BulkIndexer] indexers: indexers used in the run
+    :param int max_failed: most failed documents across all indexers to allow
+    :raises click.ClickException: if more than `max_failed` documents failed
+    """
+    failed = 0
+
+    for indexer in indexers:
+        if indexer.failed:
+            LOGGER.warning(
+                f"{indexer.failed} docs failed to index to {indexer.index}, see {indexer.dead_letter_path}"
+            )
+        failed += indexer.failed
+
+    if failed > max_failed:
+        raise click.ClickException(
+            f"{failed} docs failed to index, more than --max-failed ({max_failed})"
+        )
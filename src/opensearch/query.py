@@ -0,0 +1,363 @@
+from typing import Sequence, Optional, Literal, Union
+import base64
+import binascii
+import itertools
+import datetime
+import json
+import logging
+
+from pydantic import BaseModel, Field, StrictBool, StrictInt
+
+from src import config
+from src.opensearch.highlight import MATCH_START, MATCH_END
+from src.opensearch.index_settings import DATE_INDEX_SORT
+
+LOGGER = logging.getLogger(__name__)
+
+# Sorts on a unique key for each passage, added to the end of sorts for cursor-based
+# pagination so that search_after always gives a stable order.
+TIEBREAKER_SORT = [{"document_id": "asc"}, {"text_block_id": "asc"}]
+
+# Sort which matches the index sort of indices sorted by date. See
+# `src.opensearch.index_settings.with_date_index_sort`.
+INDEX_SORT = [{field: order} for field, order in DATE_INDEX_SORT]
+
+# Filters which counts can be returned for: request field -> (OpenSearch field, most
+# values to count)
+FACETS = {
+    "span_types": ("span_types", 1000),
+    "authors": ("document_metadata.author", 500),
+    "types": ("document_metadata.types", 100),
+    "is_party": ("is_party", 2),
+}
+
+
+class SearchRequest(BaseModel):
+    """Request body for search endpoint."""
+
+    text: str
+    span_types: Sequence[str] = []
+    is_party: Optional[bool] = None
+    index: str = "global-stocktake"
+    limit: int = Field(default=10, ge=0, le=config.SEARCH_MAX_LIMIT)
+    offset: int = Field(default=0, ge=0)
+    date_from: Optional[datetime.date] = None
+    date_to: Optional[datetime.date] = None
+    authors: Optional[Sequence[str]] = None
+    types: Optional[Sequence[str]] = None
+    sort_field: Optional[Literal["date", "relevance"]] = None
+    sort_order: Optional[Literal["asc", "desc"]] = None
+    # Offset pagination gets slower the further through the results it goes. Cursor
+    # pagination doesn't: the first request returns a cursor, which is passed to the
+    # next request to get the next page.
+    pagination: Literal["offset", "cursor"] = "offset"
+    cursor: Optional[str] = None
+    # Passed to OpenSearch. False or a lower number avoids counting every match.
+    track_total_hits: Optional[Union[StrictBool, StrictInt]] = None
+    # Source fields to include in and exclude from each hit. Wildcards are allowed.
+    fields: Optional[Sequence[str]] = None
+    exclude_fields: Optional[Sequence[str]] = None
+    # Return each document's metadata once rather than in every hit. See
+    # `src.opensearch.response.compact_search_response`.
+    compact: bool = False
+    # Return counts of results for each value of the filters in `FACETS`
+    facets: bool = False
+    # Return one hit per document, each with its top passages as inner hits. `limit`
+    # and `offset` then count documents rather than passages.
+    group_by_document: bool = False
+    passages_per_document: int = Field(
+        default=3, ge=1, le=config.SEARCH_MAX_PASSAGES_PER_DOCUMENT
+    )
+    # Add the text of the blocks before and after each hit, for indices which don't
+    # store it in every passage. See `src.opensearch.neighbours`.
+    neighbours: bool = False
+
+
+def encode_cursor(pit_id: str, search_after: Optional[list]) -> str:
+    """Encode a point in time ID and the sort values of the last hit into an opaque cursor."""
+    cursor = json.dumps({"pit_id": pit_id, "search_after": search_after})
+
+    return base64.urlsafe_b64encode(cursor.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[str, Optional[list]]:
+    """
+    Decode a cursor created by `encode_cursor`.
+
+    :param str cursor: cursor
+    :raises ValueError: if the cursor is malformed
+    :return tuple[str, Optional[list]]: point in time ID, sort values of the last hit,
+        or None to start from the first hit
+    """
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return decoded["pit_id"], decoded["search_after"]
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def build_search_query(
+    request: SearchRequest,
+    pit_id: Optional[str] = None,
+    search_after: Optional[list] = None,
+) -> dict:
+    """
+    Build the OpenSearch query body for a search request.
+
+    :param SearchRequest request: search request
+    :param Optional[str] pit_id: point in time to search, for cursor-based pagination
+    :param Optional[list] search_after: sort values of the last hit on the previous page
+    :return dict: OpenSearch query body
+    """
+
+    # Basic query body
+    query_body = {
+        "from": request.offset,
+        "size": request.limit,
+        "timeout": config.SEARCH_TIMEOUT,
+        "query": {
+            "bool": {
+                "must": [],
+            }
+        },
+    }
+
+    # Field projection
+    if request.fields or request.exclude_fields:
+        includes = list(request.fields or [])
+
+        # Compact responses group hits by document ID, and document metadata is
+        # fetched by it for normalised indices
+        if (request.compact or config.SEARCH_NORMALISED_DOCUMENTS) and includes:
+            includes.append("document_id")
+
+        # Neighbouring blocks are found by document ID and block index
+        if request.neighbours and includes:
+            includes.extend(["document_id", "block_index"])
+
+        query_body["_source"] = {
+            "includes": includes,
+            "excludes": list(request.exclude_fields or []),
+        }
+
+    # Text search. Matches are highlighted in the plain text, whose offsets are
+    # indexed, and mapped onto the HTML by `src.opensearch.highlight`.
+    if request.text:
+        query_body["query"]["bool"]["must"].append(
+            {"match": {"text": {"query": request.text, "operator": "and"}}}
+        )
+
+        query_body["highlight"] = {
+            "fields": {
+                "text": {
+                    "type": "unified",
+                    "number_of_fragments": 0,
+                    "pre_tags": [MATCH_START],
+                    "post_tags": [MATCH_END],
+                },
+            },
+        }
+
+    else:
+        query_body["query"]["bool"]["must"].append({"match_all": {}})
+
+    # Filters (span types, is_party, date, authors, types)
+    query_body["query"]["bool"].update({"filter": []})
+
+    if request.span_types:
+        # Create an OR filter for types within the same concept, and an AND filter between concepts.
+        # E.g. (Fossil fuels - Coal OR Fossil fuels - Oil) AND (Energy - Electricity)
+        types_with_concepts = sorted(
+            [(type.split("–")[0].strip(), type) for type in request.span_types]
+        )
+
+        for _, types_with_concepts_group in itertools.groupby(
+            types_with_concepts, lambda x: x[0]
+        ):
+            types = [type[1] for type in types_with_concepts_group]
+            query_body["query"]["bool"]["filter"].append(
+                {"terms": {"span_types": types}}
+            )
+
+    if request.is_party is not None:
+        query_body["query"]["bool"]["filter"].append(
+            {"term": {"is_party": request.is_party}}
+        )
+
+    if request.date_from or request.date_to:
+        query_body["query"]["bool"]["filter"].append(
+            {"range": {"document_metadata.date": {}}}
+        )
+
+        if request.date_from:
+            query_body["query"]["bool"]["filter"][-1]["range"][
+                "document_metadata.date"
+            ]["gte"] = request.date_from.strftime("%Y-%m-%d")
+
+        if request.date_to:
+            query_body["query"]["bool"]["filter"][-1]["range"][
+                "document_metadata.date"
+            ]["lte"] = request.date_to.strftime("%Y-%m-%d")
+
+    if request.authors:
+        query_body["query"]["bool"]["filter"].append(
+            {"terms": {"document_metadata.author": request.authors}}
+        )
+
+    if request.types:
+        query_body["query"]["bool"]["filter"].append(
+            {"terms": {"document_metadata.types": request.types}}
+        )
+
+    # Sort
+    if request.sort_field == "relevance" and request.sort_order == "asc":
+        LOGGER.warning(
+            "Ascending relevance sort is not supported. Defaulting to descending."
+        )
+
+    if request.sort_field == "date":
+        # Default to descending if no sort order is provided
+        query_body["sort"] = [{"document_metadata.date": request.sort_order or "desc"}]
+
+        if config.SEARCH_INDEX_SORTED_BY_DATE and query_body["sort"] == INDEX_SORT[:1]:
+            # Shards of an index sorted the same way can stop collecting once they
+            # have a page of hits, if they don't have to count every match.
+            query_body["sort"] = list(INDEX_SORT)
+            query_body["track_total_hits"] = config.SEARCH_SORTED_TRACK_TOTAL_HITS
+
+    if request.facets:
+        add_facets(query_body)
+
+    if request.group_by_document:
+        add_document_grouping(query_body, request.passages_per_document)
+
+    if request.track_total_hits is not None:
+        query_body["track_total_hits"] = request.track_total_hits
+
+    # Text searches with highlighting are the most expensive. Early termination isn't
+    # used with points in time, which page through every result, or with facets,
+    # whose counts would be wrong.
+    if (
+        config.SEARCH_TERMINATE_AFTER
+        and request.text
+        and pit_id is None
+        and not request.facets
+    ):
+        query_body["terminate_after"] = config.SEARCH_TERMINATE_AFTER
+
+    # Cursor-based pagination. The index is set by the point in time, and from/size
+    # is replaced by search_after. Pages aren't cut short by the search timeout, as a
+    # short page would otherwise be taken as the last one.
+    if pit_id is not None:
+        del query_body["from"]
+        del query_body["timeout"]
+        query_body["pit"] = {"id": pit_id, "keep_alive": config.SEARCH_PIT_KEEP_ALIVE}
+        sort = query_body.get("sort", [{"_score": "desc"}])
+        query_body["sort"] = sort + [s for s in TIEBREAKER_SORT if s not in sort]
+
+        if search_after is not None:
+            query_body["search_after"] = search_after
+
+    return query_body
+
+
+def filter_field(query_filter: dict) -> str:
+    """Get the field a term, terms or range filter is on."""
+    filter_type = next(iter(query_filter))
+
+    return next(iter(query_filter[filter_type]))
+
+
+def add_facets(query_body: dict) -> None:
+    """
+    Add aggregations which count results for each value of the filters in `FACETS`.
+
+    Filters on facet fields are moved from the query to the post filter, so that they
+    don't change the aggregations. Each facet's counts are then filtered by every
+    selected facet filter except its own, so the counts show how many results there
+    would be if that facet's selection changed.
+
+    :param dict query_body: OpenSearch query body from `build_search_query`
+    """
+    facet_fields = {field for field, _ in FACETS.values()}
+    query_filters = query_body["query"]["bool"]["filter"]
+    facet_filters = [f for f in query_filters if filter_field(f) in facet_fields]
+
+    query_body["query"]["bool"]["filter"] = [
+        f for f in query_filters if filter_field(f) not in facet_fields
+    ]
+
+    if facet_filters:
+        query_body["post_filter"] = {"bool": {"filter": facet_filters}}
+
+    query_body["aggs"] = {
+        facet: {
+            "filter": {
+                "bool": {
+                    "filter": [f for f in facet_filters if filter_field(f) != field]
+                }
+            },
+            "aggs": {"values": {"terms": {"field": field, "size": size}}},
+        }
+        for facet, (field, size) in FACETS.items()
+    }
+
+
+def add_document_grouping(query_body: dict, passages_per_document: int) -> None:
+    """
+    Collapse results on document ID, so each hit is a document with its top passages as inner hits.
+
+    Inner hits are highlighted and projected in the same way as the top-level hits.
+    A count of distinct matching documents is added as the `document_count`
+    aggregation, as the total hit count is still the number of matching passages.
+    Aggregations ignore the post filter, so if facet selections are in it, the count
+    is made within a filter aggregation on the same filter, under `documents`.
+
+    :param dict query_body: OpenSearch query body from `build_search_query`
+    :param int passages_per_document: maximum number of passages to return per document
+    """
+    inner_hits = {"name": "passages", "size": passages_per_document}
+
+    for key in ("_source", "highlight"):
+        if key in query_body:
+            inner_hits[key] = query_body[key]
+
+    query_body["collapse"] = {"field": "document_id", "inner_hits": inner_hits}
+    document_count = {"cardinality": {"field": "document_id"}}
+
+    if "post_filter" in query_body:
+        document_count = {
+            "filter": query_body["post_filter"],
+            "aggs": {"documents": document_count},
+        }
+
+    query_body.setdefault("aggs", {})["document_count"] = document_count
+
+
+def canonical_search_request(request: SearchRequest, index: str) -> str:
+    """
+    Get a string which is the same for all search requests that return the same results.
+
+    Filter values are sorted, as their order doesn't change the query, and the sort
+    order is filled in with the one the query builder would use.
+
+    :param SearchRequest request: search request
+    :param str index: concrete index name(s) the request's index resolves to
+    :return str: canonical JSON representation of the request
+    """
+    canonical = request.dict(exclude={"index"})
+
+    # An empty filter is the same as no filter
+    for field in ("span_types", "authors", "types", "fields", "exclude_fields"):
+        canonical[field] = sorted(set(canonical[field])) if canonical[field] else None
+
+    if request.sort_field == "date":
+        canonical["sort_order"] = request.sort_order or "desc"
+    else:
+        # Relevance is the default, and is always sorted descending
+        canonical["sort_field"] = None
+        canonical["sort_order"] = None
+
+    canonical["index"] = index
+
+    return json.dumps(canonical, sort_keys=True, default=str)
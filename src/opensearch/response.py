@@ -0,0 +1,132 @@
+from typing import Any
+
+from src.opensearch.query import FACETS
+
+# Fields which come from the document rather than the text block, so are the same for
+# every passage in a document. See `gst_document_to_opensearch_document`.
+DOCUMENT_FIELDS = {"languages", "translated", "has_valid_text"}
+DOCUMENT_FIELD_PREFIX = "document_"
+
+
+def is_document_field(field: str) -> bool:
+    """Whether a top-level field of an OpenSearch passage comes from its document."""
+    if field == "document_id":
+        return False
+
+    return field in DOCUMENT_FIELDS or field.startswith(DOCUMENT_FIELD_PREFIX)
+
+
+def format_facets(aggregations: dict) -> dict[str, dict[str, int]]:
+    """
+    Get counts for each facet value from aggregations added by `src.opensearch.query.add_facets`.
+
+    :param dict aggregations: aggregations from an OpenSearch search response
+    :return dict[str, dict[str, int]]: facet -> value -> count
+    """
+    return {
+        facet: {
+            bucket.get("key_as_string", str(bucket["key"])): bucket["doc_count"]
+            for bucket in aggregation.get("values", {}).get("buckets", [])
+        }
+        for facet, aggregation in aggregations.items()
+        if facet in FACETS
+    }
+
+
+def inner_hits(hit: dict) -> list[dict]:
+    """Get the passages of a hit from a search grouped by document."""
+    return hit.get("inner_hits", {}).get("passages", {}).get("hits", {}).get("hits", [])
+
+
+def compact_hit(hit: dict, documents: dict[str, dict[str, Any]]) -> dict:
+    """
+    Convert an OpenSearch hit to a hit in a compact response.
+
+    The hit's document fields are added to `documents`, and left out of the
+    returned hit.
+
+    :param dict hit: OpenSearch hit
+    :param dict[str, dict[str, Any]] documents: document ID -> document fields
+    :return dict: compact hit
+    """
+    source = hit.get("_source", {})
+    document_id = source.get("document_id")
+
+    passage = {}
+    document = documents.setdefault(document_id, {})
+
+    for field, value in source.items():
+        if is_document_field(field):
+            document[field] = value
+        elif field not in {"document_id", "text_html"}:
+            passage[field] = value
+
+    highlighted_html = hit.get("highlight", {}).get("text_html")
+    compact = {
+        "id": hit["_id"],
+        "score": hit.get("_score"),
+        "document_id": document_id,
+        "text_html": highlighted_html[0]
+        if highlighted_html
+        else source.get("text_html"),
+        "passage": passage,
+    }
+
+    if "sort" in hit:
+        compact["sort"] = hit["sort"]
+
+    if "inner_hits" in hit:
+        compact["passages"] = [
+            compact_hit(inner_hit, documents) for inner_hit in inner_hits(hit)
+        ]
+
+    return compact
+
+
+def compact_search_response(opns_result: dict) -> dict:
+    """
+    Convert an OpenSearch search response to a compact response.
+
+    Document fields are returned once for each document under `documents`, rather than
+    in every hit. Each hit has a single `text_html`, which is highlighted if there was
+    a text search, rather than both the source and the highlighted HTML.
+
+    The compact response looks like:
+
+        {
+            "took": 5,
+            "total": {"value": 100, "relation": "eq"},
+            "hits": [
+                {
+                    "id": "...",
+                    "score": 1.0,
+                    "document_id": "...",
+                    "text_html": "...",
+                    "passage": {<passage fields>},
+                }
+            ],
+            "documents": {"<document_id>": {<document fields>}},
+        }
+
+    When results are grouped by document, each hit also has a list of compact
+    `passages`. `cursor`, `facets` and `total_documents` are kept if they're in the
+    response.
+
+    :param dict opns_result: OpenSearch search response
+    :return dict: compact response
+    """
+    documents: dict[str, dict[str, Any]] = {}
+    hits = [compact_hit(hit, documents) for hit in opns_result["hits"]["hits"]]
+
+    compact_result = {
+        "took": opns_result.get("took"),
+        "total": opns_result["hits"].get("total"),
+        "hits": hits,
+        "documents": documents,
+    }
+
+    for key in ("cursor", "facets", "total_documents"):
+        if key in opns_result:
+            compact_result[key] = opns_result[key]
+
+    return compact_result
@@ -16,6 +16,9 @@ def update_aliases(new_index_prefix: str):
     """
     Update indices which point to the global-stocktake-docs and global-stocktake-docs-metadata aliases.
 
+    If the new index was built with normalised documents, the
+    global-stocktake-docs-documents alias is pointed to its documents index too.
+
     :param str new_index_prefix: the new index prefix to point to the aliases. E.g. "global-stocktake-20230525-112054"
     """
     load_dotenv(find_dotenv(), override=True)
@@ -45,6 +48,26 @@ def update_aliases(new_index_prefix: str):
         ]
     }
 
+    if opns.indices.exists(index=f"{new_index_prefix}-documents"):
+        if opns.indices.exists_alias(name="global-stocktake-docs-documents"):
+            body["actions"].append(
+                {
+                    "remove": {
+                        "index": "global-stocktake*",
+                        "alias": "global-stocktake-docs-documents",
+                    }
+                }
+            )
+
+        body["actions"].append(
+            {
+                "add": {
+                    "index": f"{new_index_prefix}-documents",
+                    "alias": "global-stocktake-docs-documents",
+                }
+            }
+        )
+
     opns.indices.update_aliases(body=body)
 
     LOGGER.info(f"Updated aliases to point to {new_index_prefix}")
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from src.admission import AdmissionController, Overloaded
+
+
+def test_admission_queues_then_hands_over_slots():
+    admission = AdmissionController(max_in_flight=2, max_queued=10, queue_timeout=1)
+    peak_in_flight = 0
+
+    async def search():
+        nonlocal peak_in_flight
+        async with admission.slot():
+            peak_in_flight = max(peak_in_flight, admission.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run_searches():
+        await asyncio.gather(*[search() for _ in range(6)])
+
+    asyncio.run(run_searches())
+
+    assert peak_in_flight == 2
+    assert admission.admitted == 6
+    assert admission.in_flight == 0
+    assert admission.queued == 0
+
+
+def test_admission_sheds_when_queue_full():
+    admission = AdmissionController(max_in_flight=1, max_queued=1, queue_timeout=1)
+
+    async def run_searches():
+        await admission.acquire()
+        queued = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(Overloaded) as exc_info:
+            await admission.acquire()
+
+        admission.release()
+        await queued
+        admission.release()
+
+        return exc_info.value
+
+    error = asyncio.run(run_searches())
+
+    assert error.reason == "queue_full"
+    assert admission.shed == {"queue_full": 1, "queue_timeout": 0}
+    assert admission.in_flight == 0
+
+
+def test_admission_sheds_after_queue_timeout():
+    admission = AdmissionController(max_in_flight=1, max_queued=1, queue_timeout=0.01)
+
+    async def run_searches():
+        await admission.acquire()
+
+        with pytest.raises(Overloaded):
+            await admission.acquire()
+
+        admission.release()
+
+    asyncio.run(run_searches())
+
+    assert admission.shed["queue_timeout"] == 1
+    assert admission.in_flight == 0
+    assert admission.queued == 0
+
+
+def test_admission_takes_a_slot_per_search_in_order():
+    admission = AdmissionController(max_in_flight=4, max_queued=10, queue_timeout=1)
+
+    async def run_searches():
+        await admission.acquire(3)
+        batch = asyncio.ensure_future(admission.acquire(3))
+        single = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+
+        # The single search would fit, but waits behind the batch queued before it
+        assert admission.in_flight == 3
+        assert admission.queued == 2
+
+        admission.release(3)
+        await batch
+        await single
+        assert admission.in_flight == 4
+
+        admission.release(3)
+        admission.release()
+
+        # Batches larger than the limit take every slot rather than never fitting
+        async with admission.slot(10):
+            assert admission.in_flight == 4
+
+    asyncio.run(run_searches())
+
+    assert admission.in_flight == 0
+    assert admission.queued == 0
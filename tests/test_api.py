@@ -1,28 +1,163 @@
+import json
+import os
+import time
+from unittest.mock import patch
+
 from fastapi.testclient import TestClient
+from httpx import Response
 from openmock.fake_opensearch import FakeOpenSearch
+from openmock.fake_indices import FakeIndicesClient
+from opensearchpy.client.utils import query_params
+from opensearchpy.exceptions import NotFoundError
 
-from src.main import app
+from src.main import (
+    app,
+    format_search_response,
+    index_resolver,
+    search_admission,
+    search_cache,
+)
 from src.opensearch.client import get_opensearch_client
+from src.opensearch.highlight import MARK_END, MARK_START, MATCH_END, MATCH_START
+from src.opensearch.query import SearchRequest
+
+
+class FakeIndicesClientWithAliases(FakeIndicesClient):
+    """Fake indices client which can resolve aliases, which openmock doesn't support."""
+
+    def get_alias(self, name=None, index=None, params=None, headers=None):
+        """Get the index an alias points to."""
+        if name not in self.client.aliases:
+            raise NotFoundError(404, "aliases_not_found_exception")
+
+        return {self.client.aliases[name]: {"aliases": {name: {}}}}
+
+
+class FakeOpenSearchWithAliases(FakeOpenSearch):
+    """
+    Fake OpenSearch client with a dictionary of alias names to index names.
+
+    It also has fake points in time, whose ID is the index name, and which are paged
+    through with search_after on each hit's position in the results.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.aliases = {}
+
+    @property
+    def indices(self):
+        """Get the fake indices client."""
+        return FakeIndicesClientWithAliases(self)
+
+    @query_params("keep_alive")
+    def create_point_in_time(self, index=None, params=None, headers=None):
+        """Create a fake point in time."""
+        return {"pit_id": index}
+
+    @query_params()
+    def delete_point_in_time(self, body=None, all=False, params=None, headers=None):
+        """Delete a fake point in time."""
+        return {
+            "pits": [
+                {"pit_id": pit_id, "successful": True} for pit_id in body["pit_id"]
+            ]
+        }
+
+    def search(self, index=None, doc_type=None, body=None, params=None, headers=None):
+        """Search, supporting points in time."""
+        if body is None or "pit" not in body:
+            return super().search(
+                index=index, body=body, params=params, headers=headers
+            )
+
+        body = dict(body)
+        pit_id = body.pop("pit")["id"]
+        start = body.pop("search_after", [-1])[0] + 1
+        size = body.pop("size", 10)
+
+        result = super().search(index=pit_id, body=body)
+        result["hits"]["hits"] = [
+            hit | {"sort": [position]}
+            for position, hit in enumerate(result["hits"]["hits"])
+        ][start : start + size]
+        result["pit_id"] = pit_id
+
+        return result
 
 
 def get_fake_opensearch():
-    fake_opns = FakeOpenSearch()
+    fake_opns = FakeOpenSearchWithAliases()
     fake_opns.indices.create("global-stocktake")
     fake_opns.indices.create("global-stocktake-metadata")
     fake_opns.index(
         index="global-stocktake-metadata", id="filters", body={"filters": []}
     )
+    fake_opns.aliases = {
+        "global-stocktake-docs": "global-stocktake",
+        "global-stocktake-docs-metadata": "global-stocktake-metadata",
+    }
     return fake_opns
 
 
+def wait_until_ready(lifespan_client: TestClient) -> Response:
+    """Poll the readiness endpoint until the background warm-up and first health check have run."""
+    for _ in range(50):
+        response = lifespan_client.get("/health/ready")
+        if response.status_code == 200:
+            break
+        time.sleep(0.02)
+
+    return response
+
+
 client = TestClient(app)
 app.dependency_overrides[get_opensearch_client] = get_fake_opensearch
 
 
 def test_get_health():
-    response = client.get("/health")
-    assert response.status_code == 200
-    assert response.json() == {"status": "OK"}
+    fake_opns = get_fake_opensearch()
+    fake_opns.index(index="global-stocktake", id="1", body={"text": "text"})
+    app.dependency_overrides[get_opensearch_client] = lambda: fake_opns
+
+    try:
+        with TestClient(app) as lifespan_client:
+            assert wait_until_ready(lifespan_client).status_code == 200
+
+            response = lifespan_client.get("/health")
+            assert response.status_code == 200
+            assert response.json()["status"] == "OK"
+            assert response.json()["checks"]["alias:global-stocktake-docs"] == {
+                "ok": True,
+                "index": "global-stocktake",
+                "doc_count": 1,
+            }
+    finally:
+        app.dependency_overrides[get_opensearch_client] = get_fake_opensearch
+
+
+def test_get_health_with_empty_index():
+    with TestClient(app) as lifespan_client:
+        assert wait_until_ready(lifespan_client).status_code == 503
+        assert lifespan_client.get("/health").status_code == 503
+        assert lifespan_client.get("/health/live").status_code == 200
+
+
+def test_startup_with_unreachable_cluster():
+    del app.dependency_overrides[get_opensearch_client]
+    unreachable = {
+        "OPENSEARCH_HOST": "https://127.0.0.1:1",
+        "OPENSEARCH_USERNAME": "user",
+        "OPENSEARCH_PASSWORD": "password",
+    }
+
+    try:
+        with patch.dict(os.environ, unreachable), TestClient(app) as lifespan_client:
+            assert lifespan_client.get("/health/live").status_code == 200
+            assert wait_until_ready(lifespan_client).status_code == 503
+            assert app.state.health.is_alive is False
+    finally:
+        app.dependency_overrides[get_opensearch_client] = get_fake_opensearch
 
 
 def test_search():
@@ -35,3 +170,318 @@ def test_get_search_filters():
     response = client.get("/searchFilters")
 
     assert response.status_code == 200
+
+
+def test_startup_uses_overridden_client():
+    with TestClient(app) as lifespan_client:
+        wait_until_ready(lifespan_client)
+        assert app.state.health.is_alive
+
+        response = lifespan_client.get("/searchFilters")
+        assert response.status_code == 200
+
+
+def test_search_results_are_cached():
+    search_cache.clear()
+    hits_before = search_cache.hits
+
+    client.post("/search", json={"text": "", "span_types": ["b", "a"]})
+    response = client.post("/search", json={"text": "", "span_types": ["a", "b"]})
+
+    assert response.status_code == 200
+    assert search_cache.hits == hits_before + 1
+
+
+def test_search_cache_invalidated_when_alias_repointed():
+    fake_opns = get_fake_opensearch()
+    fake_opns.indices.create("global-stocktake-new")
+    fake_opns.aliases["global-stocktake-docs"] = "global-stocktake"
+    app.dependency_overrides[get_opensearch_client] = lambda: fake_opns
+    index_resolver.ttl = 0
+
+    try:
+        request = {"text": "", "index": "global-stocktake-docs"}
+        client.post("/search", json=request)
+        assert len(search_cache) > 0
+
+        fake_opns.aliases["global-stocktake-docs"] = "global-stocktake-new"
+        response = client.post("/search", json=request)
+
+        assert response.status_code == 200
+        assert len(search_cache) == 1
+    finally:
+        app.dependency_overrides[get_opensearch_client] = get_fake_opensearch
+        index_resolver.ttl = 10
+
+
+def test_search_filters_are_revalidated_with_etag():
+    response = client.get("/searchFilters")
+    etag = response.headers["etag"]
+
+    assert "max-age" in response.headers["cache-control"]
+
+    response = client.get("/searchFilters", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_search_with_invalid_cursor():
+    response = client.post("/search", json={"text": "", "cursor": "not a cursor"})
+
+    assert response.status_code == 400
+
+
+def test_search_with_cursor_continues_after_timed_out_page():
+    fake_opns = get_fake_opensearch()
+    for i in range(3):
+        fake_opns.index(
+            index="global-stocktake",
+            id=str(i),
+            body={"text_block_id": str(i), "span_types": ["Adaptation – All"]},
+        )
+    search = fake_opns.search
+
+    def timed_out_search(*args, **kwargs):
+        """Return one hit fewer than requested, as if the search timed out."""
+        result = search(*args, **kwargs)
+        result["hits"]["hits"] = result["hits"]["hits"][:1]
+        result["timed_out"] = True
+        return result
+
+    app.dependency_overrides[get_opensearch_client] = lambda: fake_opns
+    request = {
+        "text": "",
+        "span_types": ["Adaptation – All"],
+        "pagination": "cursor",
+        "limit": 2,
+    }
+
+    try:
+        with patch.object(fake_opns, "search", timed_out_search):
+            first_page = client.post("/search", json=request).json()
+
+        second_page = client.post(
+            "/search", json=request | {"cursor": first_page["cursor"]}
+        ).json()
+    finally:
+        app.dependency_overrides[get_opensearch_client] = get_fake_opensearch
+
+    assert len(first_page["hits"]["hits"]) == 1
+    assert first_page["cursor"] is not None
+    assert len(second_page["hits"]["hits"]) == 2
+    assert second_page["cursor"] is not None
+
+
+def test_search_with_fields_keeps_text_highlight():
+    request = SearchRequest(text="coal", fields=["text"])
+    opns_result = {
+        "hits": {
+            "hits": [
+                {
+                    "_source": {"text": "coal power"},
+                    "highlight": {"text": [f"{MATCH_START}coal{MATCH_END} power"]},
+                }
+            ]
+        }
+    }
+
+    response = format_search_response(request, opns_result)
+
+    assert response["hits"]["hits"][0]["highlight"] == {
+        "text": [f"{MARK_START}coal{MARK_END} power"]
+    }
+
+
+def test_search_with_cursor_and_no_limit():
+    response = client.post(
+        "/search", json={"text": "", "pagination": "cursor", "limit": 0}
+    )
+
+    assert response.status_code == 400
+
+
+def test_search_past_max_result_window():
+    with patch("src.main.config.SEARCH_MAX_RESULT_WINDOW", 100):
+        allowed = client.post("/search", json={"text": "", "offset": 90, "limit": 10})
+        response = client.post("/search", json={"text": "", "offset": 95, "limit": 10})
+        batch_response = client.post(
+            "/search/batch", json=[{"text": "", "offset": 95, "limit": 10}]
+        )
+
+    assert allowed.status_code == 200
+    assert response.status_code == 400
+    assert "cursor" in response.json()["detail"]
+    assert batch_response.json()[0]["status"] == 400
+
+
+def test_search_with_negative_offset():
+    response = client.post("/search", json={"text": "", "offset": -1})
+
+    assert response.status_code == 422
+
+
+def test_search_compact():
+    response = client.post("/search", json={"text": "", "compact": True})
+
+    assert response.status_code == 200
+    assert set(response.json().keys()) >= {"hits", "documents", "total"}
+
+
+def test_search_batch():
+    search_cache.clear()
+    response = client.post(
+        "/search/batch",
+        json=[
+            {"text": "", "span_types": ["Adaptation – All"]},
+            {"text": "", "pagination": "cursor"},
+            {"text": "", "compact": True},
+        ],
+    )
+    results = response.json()
+
+    assert response.status_code == 200
+    assert [result["status"] for result in results] == [200, 400, 200]
+    assert "documents" in results[2]["result"]
+
+
+def test_search_with_facets():
+    response = client.post("/search", json={"text": "", "facets": True})
+
+    assert response.status_code == 200
+    assert set(response.json()["facets"].keys()) == {
+        "span_types",
+        "authors",
+        "types",
+        "is_party",
+    }
+
+
+def test_export_search_results():
+    fake_opns = get_fake_opensearch()
+    for i in range(5):
+        fake_opns.index(
+            index="global-stocktake",
+            id=str(i),
+            body={
+                "document_id": "doc-1",
+                "text_block_id": str(i),
+                "text": f"text {i}",
+                "span_types": ["Adaptation – All", "Mitigation – All"],
+            },
+        )
+    app.dependency_overrides[get_opensearch_client] = lambda: fake_opns
+
+    try:
+        with patch("src.opensearch.export.config.SEARCH_EXPORT_PAGE_SIZE", 2):
+            request = {"text": "", "span_types": ["Adaptation – All"]}
+            ndjson_response = client.post("/search/export", json=request)
+            csv_response = client.post(
+                "/search/export?format=csv",
+                json=request | {"fields": ["text_block_id", "span_types"]},
+            )
+    finally:
+        app.dependency_overrides[get_opensearch_client] = get_fake_opensearch
+
+    assert ndjson_response.status_code == 200
+    assert [
+        json.loads(line)["text_block_id"] for line in ndjson_response.text.splitlines()
+    ] == ["0", "1", "2", "3", "4"]
+
+    assert csv_response.status_code == 200
+    assert csv_response.text.splitlines()[:2] == [
+        "text_block_id,span_types",
+        "0,Adaptation – All; Mitigation – All",
+    ]
+    assert len(csv_response.text.splitlines()) == 6
+
+
+def test_export_search_results_adds_document_fields():
+    fake_opns = get_fake_opensearch()
+    fake_opns.index(
+        index="global-stocktake",
+        id="0",
+        body={
+            "document_id": "doc-1",
+            "text_block_id": "0",
+            "span_types": ["Adaptation – All"],
+        },
+    )
+
+    def mget(index=None, body=None, **params):
+        """Get documents from the documents index by ID."""
+        return {
+            "docs": [
+                {"_id": id, "found": True, "_source": {"document_name": "NDC"}}
+                for id in body["ids"]
+            ]
+        }
+
+    app.dependency_overrides[get_opensearch_client] = lambda: fake_opns
+
+    try:
+        with patch("src.main.config.SEARCH_NORMALISED_DOCUMENTS", True), patch.object(
+            fake_opns, "mget", mget
+        ):
+            response = client.post(
+                "/search/export?format=csv",
+                json={
+                    "text": "",
+                    "span_types": ["Adaptation – All"],
+                    "fields": ["text_block_id", "document_name"],
+                },
+            )
+    finally:
+        app.dependency_overrides[get_opensearch_client] = get_fake_opensearch
+
+    assert response.status_code == 200
+    assert response.text.splitlines() == ["text_block_id,document_name", "0,NDC"]
+
+
+def test_search_grouped_by_document_with_cursor():
+    response = client.post(
+        "/search",
+        json={"text": "", "group_by_document": True, "pagination": "cursor"},
+    )
+
+    assert response.status_code == 400
+
+
+def test_search_shed_when_overloaded():
+    search_cache.clear()
+
+    with patch.object(search_admission, "max_in_flight", 0), patch.object(
+        search_admission, "max_queued", 0
+    ):
+        response = client.post("/search", json={"text": "shed"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert search_admission.shed["queue_full"] >= 1
+
+
+def test_export_holds_admission_slot_until_sent():
+    with patch.object(search_admission, "max_in_flight", 0), patch.object(
+        search_admission, "max_queued", 0
+    ):
+        shed_response = client.post("/search/export", json={"text": ""})
+
+    response = client.post(
+        "/search/export", json={"text": "", "span_types": ["Adaptation – All"]}
+    )
+
+    assert shed_response.status_code == 503
+    assert response.status_code == 200
+    assert search_admission.in_flight == 0
+
+
+def test_get_metrics():
+    client.post("/search", json={"text": "", "span_types": ["Adaptation – All"]})
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert 'http_requests_total{method="POST",route="/search",status="200"}' in (
+        response.text
+    )
+    assert 'search_filter_requests_total{filter="span_types"}' in response.text
+    assert 'search_cache_events_total{event="hits"}' in response.text
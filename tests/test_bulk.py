@@ -0,0 +1,114 @@
+import json
+from datetime import date
+
+from opensearchpy import JSONSerializer, TransportError
+
+from src.opensearch.bulk import BulkIndexer, SpooledActions
+
+
+class FakeBulkClient:
+    """Client with a bulk API which responds with each status in turn, then 200s."""
+
+    def __init__(self, request_statuses=(), item_statuses=None):
+        self.transport = type("Transport", (), {"serializer": JSONSerializer()})()
+        self.request_statuses = list(request_statuses)
+        self.item_statuses = item_statuses or {}
+        self.requests = []
+
+    def bulk(self, body, index, request_timeout):
+        """Respond to a bulk request, or reject it."""
+        lines = body.decode().splitlines()
+        self.requests.append(lines)
+
+        if self.request_statuses:
+            status = self.request_statuses.pop(0)
+            raise TransportError(status, "rejected", {})
+
+        items = []
+        for action_line in lines[::2]:
+            _id = json.loads(action_line)["index"]["_id"]
+            statuses = self.item_statuses.get(_id, [])
+            status = statuses.pop(0) if statuses else 201
+            items.append({"index": {"_id": _id, "status": status}})
+
+        return {"errors": False, "items": items}
+
+
+def docs(n):
+    return [{"_id": str(i), "text": "x" * 100} for i in range(n)]
+
+
+def test_bulk_indexer_chunks_by_count_and_bytes():
+    opns = FakeBulkClient()
+    BulkIndexer(opns, "index", threads=1, chunk_size=3).index_actions(docs(10))
+    assert [len(lines) // 2 for lines in opns.requests] == [3, 3, 3, 1]
+
+    opns = FakeBulkClient()
+    indexer = BulkIndexer(opns, "index", threads=2, max_chunk_bytes=300)
+    indexer.index_actions(docs(10))
+
+    assert all(len(lines) // 2 <= 2 for lines in opns.requests)
+    assert indexer.docs == 10
+    assert indexer.bytes > 1000
+
+
+def test_bulk_indexer_halves_chunks_when_rejected():
+    opns = FakeBulkClient(request_statuses=[413, 429])
+    indexer = BulkIndexer(opns, "index", threads=1, chunk_size=8, initial_backoff=0)
+    indexer.index_actions(docs(16))
+
+    assert indexer.docs == 16
+    assert indexer.failed == 0
+    assert indexer.chunk_size == 2
+    assert indexer.retries == 1
+
+
+def test_bulk_indexer_retries_and_dead_letters_items(tmp_path):
+    dead_letter_path = tmp_path / "failed.ndjson"
+    opns = FakeBulkClient(item_statuses={"1": [429, 429], "2": [400], "3": [429] * 5})
+    indexer = BulkIndexer(
+        opns,
+        "index",
+        threads=1,
+        max_retries=2,
+        initial_backoff=0,
+        dead_letter_path=dead_letter_path,
+    )
+    indexer.index_actions(docs(5))
+
+    assert indexer.docs == 3
+    assert indexer.failed == 2
+
+    failed = [json.loads(line) for line in dead_letter_path.read_text().splitlines()]
+    assert sorted(
+        (item["action"]["index"]["_id"], item["status"]) for item in failed
+    ) == [
+        ("2", 400),
+        ("3", 429),
+    ]
+    assert failed[0]["source"]["text"] == "x" * 100
+
+
+def test_spooled_actions_are_read_back_in_order():
+    spool = SpooledActions()
+    spool.add({"_id": "doc-1", "date": date(2023, 1, 1)})
+    spool.add({"_id": "doc-2", "date": None})
+
+    assert spool.count == 2
+    assert list(spool) == [
+        {"_id": "doc-1", "date": "2023-01-01"},
+        {"_id": "doc-2", "date": None},
+    ]
+    # Reading again starts from the first action
+    assert [action["_id"] for action in spool] == ["doc-1", "doc-2"]
+
+    opns = FakeBulkClient()
+    BulkIndexer(opns, "index", threads=1).index_actions(spool)
+    spool.close()
+
+    assert [json.loads(line) for line in opns.requests[0]] == [
+        {"index": {"_id": "doc-1"}},
+        {"date": "2023-01-01"},
+        {"index": {"_id": "doc-2"}},
+        {"date": None},
+    ]
@@ -0,0 +1,139 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+from src.cache import DiskCache, LRUCache, SingleFlight, json_size
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, max_bytes=1000, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_json_size_counts_utf8_bytes():
+    assert json_size({"text": "–"}) == len('{"text":"–"}'.encode("utf-8"))
+    assert json_size({1: object}) > 0
+
+
+def test_lru_cache_is_bounded_by_bytes():
+    cache = LRUCache(max_entries=100, max_bytes=20, ttl=60)
+    cache.set("a", "x" * 10)
+    cache.set("b", "x" * 10)
+
+    assert len(cache) == 1
+    assert cache.current_bytes <= 20
+
+    cache.set("c", "x" * 100)
+
+    assert cache.get("c") is None
+
+
+def test_lru_cache_entries_expire():
+    cache = LRUCache(max_entries=10, max_bytes=1000, ttl=60)
+
+    with patch("src.cache.time.monotonic", return_value=0):
+        cache.set("a", 1)
+
+    with patch("src.cache.time.monotonic", return_value=61):
+        assert cache.get("a") is None
+
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def search():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"hits": []}
+
+    async def run_searches():
+        return await asyncio.gather(
+            *[single_flight.do("key", search) for _ in range(10)],
+            single_flight.do("other-key", search),
+        )
+
+    results = asyncio.run(run_searches())
+
+    assert len(calls) == 2
+    assert results[0] is results[9]
+    assert single_flight.calls == 2
+    assert single_flight.coalesced == 9
+
+
+def test_single_flight_shares_exceptions():
+    single_flight = SingleFlight()
+
+    async def failing_search():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("Search failed")
+
+    async def run_searches():
+        return await asyncio.gather(
+            *[single_flight.do("key", failing_search) for _ in range(3)],
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run_searches())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert single_flight.calls == 1
+
+
+def test_disk_cache_gets_and_counts(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=1000)
+    cache.set("ab12", "<div>cached</div>")
+
+    assert cache.get("ab12") == "<div>cached</div>"
+    assert cache.get("cd34") is None
+    assert DiskCache(tmp_path, max_bytes=1000).get("ab12") == "<div>cached</div>"
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=25)
+
+    for i, key in enumerate(["aa", "bb", "cc"]):
+        cache.set(key, "x" * 10)
+        os.utime(tmp_path / key[:2] / key, (i, i))
+
+    cache.get("aa")
+
+    assert cache.evict() == 1
+    assert cache.get("bb") is None
+    assert cache.get("aa") is not None
+    assert cache.get("cc") is not None
+
+
+def get_from_worker_cache(key):
+    return worker_cache.get(key)
+
+
+def set_worker_cache(cache):
+    global worker_cache
+    worker_cache = cache
+
+
+def test_disk_cache_counts_hits_in_child_processes(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=1000)
+    cache.set("ab12", "cached")
+
+    with ProcessPoolExecutor(
+        2, initializer=set_worker_cache, initargs=(cache,)
+    ) as executor:
+        results = list(executor.map(get_from_worker_cache, ["ab12"] * 3 + ["cd34"]))
+
+    assert results == ["cached"] * 3 + [None]
+    assert (cache.hits, cache.misses) == (3, 1)
@@ -0,0 +1,59 @@
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.compression import CompressionMiddleware, negotiate_encoding
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+LARGE_BODY = "<p>text block</p>" * 100
+
+
+@app.get("/large")
+def get_large():
+    return PlainTextResponse(LARGE_BODY)
+
+
+@app.get("/small")
+def get_small():
+    return PlainTextResponse("small")
+
+
+@app.get("/stream")
+def get_stream():
+    return StreamingResponse(iter([LARGE_BODY, LARGE_BODY]), media_type="text/plain")
+
+
+client = TestClient(app)
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert negotiate_encoding("br;q=0, gzip") == "gzip"
+    assert negotiate_encoding("deflate") is None
+    assert negotiate_encoding("") is None
+
+
+def test_large_response_is_compressed():
+    for encoding in ("gzip", "br"):
+        response = client.get("/large", headers={"Accept-Encoding": encoding})
+
+        assert response.headers["content-encoding"] == encoding
+        assert int(response.headers["content-length"]) < len(LARGE_BODY)
+        assert response.text == LARGE_BODY
+
+
+def test_small_response_is_not_compressed():
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.text == "small"
+
+
+def test_streaming_response_is_compressed():
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == LARGE_BODY * 2
@@ -0,0 +1,127 @@
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+
+from src.opensearch.documents import (
+    FilterValues,
+    hydrate_documents,
+    merge_document,
+    passage_document_fields,
+)
+
+
+class FakeDocumentsClient:
+    """Fake client which returns documents from a dictionary for mget calls."""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.calls = []
+
+    def mget(self, index=None, body=None, **params):
+        """Get documents by ID."""
+        self.calls.append((index, body, params))
+        return {
+            "docs": [
+                {"_id": id, "found": True, "_source": self.documents[id]}
+                if id in self.documents
+                else {"_id": id, "found": False}
+                for id in body["ids"]
+            ]
+        }
+
+
+def test_merge_document_keeps_passage_values():
+    document = {
+        "document_name": "NDC",
+        "document_metadata": {"date": "2023-01-01", "link": "https://example.org"},
+    }
+    source = {"document_id": "doc-1", "document_metadata": {"date": "2023-02-01"}}
+
+    assert merge_document(document, source) == {
+        "document_id": "doc-1",
+        "document_name": "NDC",
+        "document_metadata": {"date": "2023-02-01", "link": "https://example.org"},
+    }
+
+
+def test_hydrate_documents_uses_one_mget():
+    opns = FakeDocumentsClient({"doc-1": {"document_name": "NDC"}})
+    hits = [
+        {"_source": {"document_id": "doc-1", "text": "a"}},
+        {"_source": {"document_id": "doc-1", "text": "b"}},
+        {"_source": {"document_id": "doc-2", "text": "c"}},
+    ]
+
+    asyncio.run(hydrate_documents(opns, "docs-documents", hits, fields=["document_*"]))
+
+    assert opns.calls == [
+        (
+            "docs-documents",
+            {"ids": ["doc-1", "doc-2"]},
+            {"_source_includes": "document_*"},
+        )
+    ]
+    assert [hit["_source"].get("document_name") for hit in hits] == [
+        "NDC",
+        "NDC",
+        None,
+    ]
+
+
+def test_normalised_passages_are_hydrated_from_documents_index():
+    document = {
+        "document_id": "doc-1",
+        "document_name": "NDC",
+        "document_metadata": {
+            "date": "2023-01-01",
+            "author": ["France"],
+            "types": ["Party"],
+            "link": "https://example.org",
+        },
+    }
+    block = {"text_block_id": "p_0_b_0", "text": "a"}
+    opns = FakeDocumentsClient({"doc-1": document})
+    hits = [{"_source": passage_document_fields(document) | block}]
+
+    assert hits[0]["_source"]["document_metadata"] == {
+        "date": "2023-01-01",
+        "author": ["France"],
+        "types": ["Party"],
+    }
+
+    asyncio.run(hydrate_documents(opns, "docs-documents", hits))
+
+    assert hits[0]["_source"] == document | block
+
+
+def fake_document(doc_date, author, types):
+    """Make a fake document with the metadata `FilterValues` collects."""
+    return SimpleNamespace(
+        document_metadata=SimpleNamespace(date=doc_date, author=author, types=types)
+    )
+
+
+def test_filter_values_are_collected_from_each_document():
+    concepts = {"Mitigation": ["Mitigation – All"]}
+    filter_values = FilterValues(concepts)
+
+    for doc in [
+        fake_document(date(2023, 3, 1), ["France"], ["Party"]),
+        fake_document(None, ["UNFCCC"], ["Constituted Body", "Party"]),
+        fake_document(date(2022, 11, 5), ["France", "Chile"], []),
+    ]:
+        filter_values.add(doc)
+
+    assert filter_values.to_dict() == {
+        "dates": {"date_min": "2022-11-05", "date_max": "2023-03-01"},
+        "authors": ["Chile", "France", "UNFCCC"],
+        "types": ["Constituted Body", "Party"],
+        "concepts": concepts,
+    }
+
+
+def test_filter_values_without_dates():
+    filter_values = FilterValues({})
+    filter_values.add(fake_document(None, [], []))
+
+    assert filter_values.to_dict()["dates"] == {"date_min": None, "date_max": None}
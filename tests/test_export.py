@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+from src.opensearch.export import export_search_results
+from src.opensearch.query import SearchRequest
+
+
+class FakePointInTimeClient:
+    """Fake client whose searches always return a full page, recording points in time."""
+
+    def __init__(self, search_seconds=0):
+        self.search_seconds = search_seconds
+        self.created = []
+        self.deleted = []
+
+    def create_point_in_time(self, index, keep_alive):
+        """Create a fake point in time."""
+        self.created.append(index)
+        return {"pit_id": f"pit-{len(self.created)}"}
+
+    def delete_point_in_time(self, body, ignore):
+        """Delete a fake point in time."""
+        self.deleted.extend(body["pit_id"])
+
+    def search(self, body):
+        """Return a page of hits after waiting `search_seconds`."""
+        time.sleep(self.search_seconds)
+        start = body.get("search_after", [-1])[0] + 1
+        return {
+            "pit_id": body["pit"]["id"],
+            "hits": {
+                "hits": [
+                    {"_source": {"text_block_id": str(i)}, "sort": [i]}
+                    for i in range(start, start + body["size"])
+                ]
+            },
+        }
+
+
+def test_export_deletes_point_in_time_when_closed_early():
+    opns = FakePointInTimeClient()
+
+    async def read_first_page():
+        export = export_search_results(opns, SearchRequest(text=""), "index", "ndjson")
+        first_page = await export.__anext__()
+        await export.aclose()
+        # Deleted on closing, not when the event loop shuts down
+        assert opns.deleted == ["pit-1"]
+        return first_page
+
+    assert asyncio.run(read_first_page()).startswith('{"text_block_id": "0"}')
+    assert opns.created == ["index"]
+
+
+def test_export_deletes_point_in_time_when_cancelled():
+    opns = FakePointInTimeClient(search_seconds=0.2)
+
+    async def cancel_during_search():
+        export = export_search_results(opns, SearchRequest(text=""), "index", "ndjson")
+        task = asyncio.ensure_future(export.__anext__())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        # The shielded deletion carries on after the task is cancelled
+        await asyncio.sleep(0.05)
+
+    asyncio.run(cancel_during_search())
+
+    assert opns.created == ["index"]
+    assert opns.deleted == ["pit-1"]
@@ -0,0 +1,81 @@
+from src.opensearch.highlight import (
+    MARK_END,
+    MARK_START,
+    MATCH_END,
+    MATCH_START,
+    add_html_highlight,
+    highlight_html,
+    match_offsets,
+)
+
+TEXT = "Coal  power & oil use"
+TEXT_HTML = """<div>
+ <span class="text-highlight Fossil-Fuels">
+  Coal
+  <span class="span-label" id="Fossil Fuels – Coal">
+   <span class="concept-label">Fossil Fuels – </span><span class="subconcept-label">Coal</span>
+  </span>
+ </span>
+ power &amp; oil use
+</div>"""
+
+
+def test_match_offsets():
+    highlighted = (
+        f"{MATCH_START}Coal{MATCH_END}  power & {MATCH_START}oil{MATCH_END} use"
+    )
+
+    assert match_offsets(highlighted) == [(0, 4), (14, 17)]
+
+
+def test_highlight_html_skips_labels_and_keeps_entities():
+    highlighted = highlight_html(TEXT_HTML, TEXT, [(0, 4), (12, 17)])
+
+    assert f"{MARK_START}Coal{MARK_END}" in highlighted
+    assert f"{MARK_START}&amp; oil{MARK_END}" in highlighted
+    assert f"{MARK_START}Fossil" not in highlighted
+    assert highlighted.count(MARK_START) == highlighted.count(MARK_END) == 2
+
+
+def test_highlight_html_reopens_marks_around_tags():
+    highlighted = highlight_html("<p>coal <b>power</b></p>", "coal power", [(0, 10)])
+
+    assert highlighted == (
+        f"<p>{MARK_START}coal {MARK_END}<b>{MARK_START}power{MARK_END}</b></p>"
+    )
+
+
+def test_highlight_html_with_mismatched_text():
+    assert highlight_html("<p>coal</p>", "oil", [(0, 3)]) is None
+
+
+def test_add_html_highlight():
+    hit = {
+        "_source": {"text_html": "<p>coal power</p>"},
+        "highlight": {"text": [f"{MATCH_START}coal{MATCH_END} power"]},
+    }
+
+    add_html_highlight(hit)
+
+    assert hit["highlight"] == {
+        "text_html": [f"<p>{MARK_START}coal{MARK_END} power</p>"]
+    }
+
+
+def test_add_html_highlight_without_html_keeps_text_highlight():
+    hit = {
+        "_source": {"text": "coal & power"},
+        "highlight": {"text": [f"{MATCH_START}coal{MATCH_END} & power"]},
+    }
+
+    add_html_highlight(hit)
+
+    assert hit["highlight"] == {"text": [f"{MARK_START}coal{MARK_END} &amp; power"]}
+
+
+def test_highlight_html_splits_text_runs_at_matches():
+    highlighted = highlight_html(
+        "<p>coal  power\n oil and gas</p>", "coal power oil and gas", [(5, 14)]
+    )
+
+    assert highlighted == f"<p>coal  {MARK_START}power\n oil{MARK_END} and gas</p>"
@@ -0,0 +1,30 @@
+from src.opensearch.index_settings import index_settings, nest_properties
+
+
+def test_nest_properties():
+    assert nest_properties(
+        {"document_metadata.date": {"type": "date"}, "text": {"type": "text"}}
+    ) == {
+        "document_metadata": {
+            "properties": {"date": {"type": "date"}},
+            "dynamic": False,
+        },
+        "text": {"type": "text"},
+    }
+
+
+def test_mapping_is_explicit_and_display_fields_are_not_indexed():
+    mappings = index_settings["mappings"]
+
+    assert mappings["dynamic"] is False
+    assert mappings["properties"]["spans"] == {"type": "object", "enabled": False}
+    assert mappings["properties"]["text_before"]["index"] is False
+    assert mappings["properties"]["page_number"] == {
+        "type": "integer",
+        "index": False,
+        "doc_values": False,
+    }
+    assert (
+        mappings["properties"]["document_metadata"]["properties"]["date"]["type"]
+        == "date"
+    )
@@ -0,0 +1,26 @@
+from src.metrics import Counter, Histogram, Registry
+
+
+def test_render_counter_and_histogram():
+    registry = Registry()
+    counter = registry.register(Counter("requests_total", "Requests.", ["route"]))
+    histogram = registry.register(
+        Histogram("latency_seconds", "Latency.", ["route"], buckets=[0.1, 1])
+    )
+
+    counter.inc(route="/search")
+    counter.inc(route="/search")
+    histogram.observe(0.5, route="/search")
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{route="/search"} 2.0',
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/search",le="0.1"} 0',
+        'latency_seconds_bucket{route="/search",le="1.0"} 1',
+        'latency_seconds_bucket{route="/search",le="+Inf"} 1',
+        'latency_seconds_sum{route="/search"} 0.5',
+        'latency_seconds_count{route="/search"} 1',
+    ]
@@ -0,0 +1,35 @@
+from src.opensearch.neighbours import add_neighbour_text, neighbours_query
+
+
+def test_neighbours_query_groups_blocks_by_document():
+    hits = [
+        {"_source": {"document_id": "doc-1", "block_index": 0}},
+        {"_source": {"document_id": "doc-1", "block_index": 4}},
+        {"_source": {"document_id": "doc-2", "block_index": 2}},
+        {"_source": {"document_id": "doc-3", "block_index": 1, "text_before": ""}},
+    ]
+
+    query = neighbours_query(hits)
+
+    assert query["size"] == 6
+    assert query["query"]["bool"]["should"][0]["bool"]["filter"] == [
+        {"term": {"document_id": "doc-1"}},
+        {"terms": {"block_index": [-1, 1, 3, 5]}},
+    ]
+    assert len(query["query"]["bool"]["should"]) == 2
+
+
+def test_neighbours_query_without_block_indices():
+    assert neighbours_query([{"_source": {"document_id": "doc-1"}}]) is None
+
+
+def test_add_neighbour_text():
+    hits = [{"_source": {"document_id": "doc-1", "block_index": 0}}]
+    neighbour_hits = [
+        {"_source": {"document_id": "doc-1", "block_index": 1, "text": "next"}}
+    ]
+
+    add_neighbour_text(hits, neighbour_hits)
+
+    assert hits[0]["_source"]["text_before"] == ""
+    assert hits[0]["_source"]["text_after"] == "next"
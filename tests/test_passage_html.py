@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from src.opensearch.passage_html import cache_key, spans_to_html
+
+# Rendered by the displacy and BeautifulSoup renderer `text_block_to_html` used to
+# use, kept in `benchmarks.passage_html.displacy_html`
+GOLDEN_CASES = json.loads(
+    (Path(__file__).parent / "data" / "passage_html_golden.json").read_text()
+)
+
+
+@pytest.mark.parametrize("case", GOLDEN_CASES, ids=[c["name"] for c in GOLDEN_CASES])
+def test_spans_to_html_matches_displacy_renderer(case):
+    tokens = [tuple(token) for token in case["tokens"]]
+    spans = [tuple(span) for span in case["spans"]]
+
+    assert spans_to_html(case["text"], tokens, spans) == case["html"]
+
+
+def test_spans_to_html_labels_and_classes():
+    text = "Phase out coal power"
+    tokens = [("Phase", 0), ("out", 6), ("coal", 10), ("power", 15)]
+    html = spans_to_html(text, tokens, [(10, 15, "Fossil Fuels – Coal")])
+
+    assert 'class="text-highlight Fossil-Fuels-–-Coal"' in html
+    assert 'class="span-label" id="Fossil Fuels – Coal"' in html
+    assert html.count('class="concept-label"') == 1
+    assert html.count("text-highlight") == 1
+    # The token containing the end offset is part of the span
+    assert html.count("height: 60px") == 2
+
+
+def test_spans_to_html_rejects_spans_outside_text():
+    with pytest.raises(ValueError):
+        spans_to_html("coal", [("coal", 0)], [(0, 5, "Fossil Fuels – Coal")])
+
+
+def test_cache_key_depends_on_text_and_spans_not_their_order():
+    spans = [(0, 4, "Fossil Fuels – Coal"), (10, 15, "Fossil Fuels – Oil")]
+
+    assert cache_key("hash", spans) == cache_key("hash", spans[::-1])
+    assert cache_key("hash", spans) != cache_key("other-hash", spans)
+    assert cache_key("hash", spans) != cache_key("hash", spans[:1])
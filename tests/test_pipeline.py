@@ -0,0 +1,62 @@
+import time
+
+import click
+import pytest
+
+from src.opensearch.bulk import BulkIndexer
+from src.opensearch.pipeline import StageThroughput, check_failures, map_in_order
+
+
+def square(n):
+    """Square a number, slower for small numbers so that results finish out of order."""
+    time.sleep(0.01 * (5 - n % 5))
+    return n * n
+
+
+def test_map_in_order_keeps_order_across_workers():
+    assert list(map_in_order(square, range(10), workers=3)) == [
+        n * n for n in range(10)
+    ]
+    assert list(map_in_order(square, range(3))) == [0, 1, 4]
+
+
+def test_map_in_order_reads_at_most_a_window_ahead():
+    read = []
+
+    def items():
+        for n in range(20):
+            read.append(n)
+            yield n
+
+    for position, _ in enumerate(map_in_order(square, items(), workers=2, window=3)):
+        assert len(read) - position <= 3
+
+
+def test_stage_throughput_excludes_upstream_time():
+    def slow(items, seconds):
+        for item in items:
+            time.sleep(seconds)
+            yield item
+
+    loading = StageThroughput("load", "documents")
+    conversion = StageThroughput("convert", "documents", upstream=loading)
+    loaded = loading.wrap(slow(range(5), 0.05))
+    converted = list(conversion.wrap(slow(loaded, 0.01)))
+
+    assert converted == list(range(5))
+    assert loading.count == conversion.count == 5
+    assert loading.own_seconds >= 0.25
+    # Conversion's own time is its five 0.01s sleeps, without loading's 0.05s ones
+    assert 0.05 <= conversion.own_seconds < 0.2
+    assert conversion.summary().startswith("convert: 5 documents in ")
+
+
+def test_check_failures_allows_up_to_max_failed():
+    passages = BulkIndexer(None, "passages")
+    documents = BulkIndexer(None, "documents")
+    passages.failed, documents.failed = 2, 1
+
+    check_failures([passages, documents], max_failed=3)
+
+    with pytest.raises(click.ClickException, match="3 docs failed"):
+        check_failures([passages, documents], max_failed=2)
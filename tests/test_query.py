@@ -0,0 +1,166 @@
+from unittest.mock import patch
+
+import pytest
+
+from src.opensearch.index_settings import index_settings, with_date_index_sort
+from src.opensearch.query import (
+    SearchRequest,
+    build_search_query,
+    canonical_search_request,
+    encode_cursor,
+    decode_cursor,
+    TIEBREAKER_SORT,
+)
+
+
+def test_canonical_search_request_ignores_filter_order():
+    request_1 = SearchRequest(text="", span_types=["b", "a"], sort_field="relevance")
+    request_2 = SearchRequest(text="", span_types=["a", "b"])
+
+    assert canonical_search_request(request_1, "idx") == canonical_search_request(
+        request_2, "idx"
+    )
+    assert canonical_search_request(request_1, "idx") != canonical_search_request(
+        request_1, "other-idx"
+    )
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("pit-id", ["2023-01-01", "doc", "block"])
+
+    assert decode_cursor(cursor) == ("pit-id", ["2023-01-01", "doc", "block"])
+
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+
+
+def test_build_search_query_with_cursor():
+    request = SearchRequest(text="", sort_field="date", track_total_hits=False)
+    query_body = build_search_query(
+        request, pit_id="pit-id", search_after=["2023-01-01", "doc", "block"]
+    )
+
+    assert "from" not in query_body
+    assert "timeout" not in query_body
+    assert query_body["pit"]["id"] == "pit-id"
+    assert query_body["search_after"] == ["2023-01-01", "doc", "block"]
+    assert query_body["sort"] == [{"document_metadata.date": "desc"}] + TIEBREAKER_SORT
+    assert query_body["track_total_hits"] is False
+
+
+def test_build_search_query_with_fields():
+    request = SearchRequest(text="", fields=["text"], compact=True)
+    query_body = build_search_query(request)
+
+    assert query_body["_source"] == {
+        "includes": ["text", "document_id"],
+        "excludes": [],
+    }
+
+
+def test_build_search_query_with_facets():
+    request = SearchRequest(
+        text="",
+        span_types=["Adaptation – All"],
+        authors=["Party"],
+        date_from="2020-01-01",
+        facets=True,
+    )
+    query_body = build_search_query(request)
+
+    assert query_body["query"]["bool"]["filter"] == [
+        {"range": {"document_metadata.date": {"gte": "2020-01-01"}}}
+    ]
+    assert query_body["post_filter"]["bool"]["filter"] == [
+        {"terms": {"span_types": ["Adaptation – All"]}},
+        {"terms": {"document_metadata.author": ["Party"]}},
+    ]
+    assert query_body["aggs"]["span_types"]["filter"]["bool"]["filter"] == [
+        {"terms": {"document_metadata.author": ["Party"]}}
+    ]
+    assert query_body["aggs"]["authors"]["filter"]["bool"]["filter"] == [
+        {"terms": {"span_types": ["Adaptation – All"]}}
+    ]
+
+
+def test_build_search_query_grouped_by_document():
+    request = SearchRequest(
+        text="adaptation", group_by_document=True, passages_per_document=2
+    )
+    query_body = build_search_query(request)
+
+    assert query_body["collapse"]["field"] == "document_id"
+    assert query_body["collapse"]["inner_hits"]["size"] == 2
+    assert query_body["collapse"]["inner_hits"]["highlight"] == query_body["highlight"]
+    assert query_body["aggs"]["document_count"] == {
+        "cardinality": {"field": "document_id"}
+    }
+
+
+def test_build_search_query_grouped_by_document_with_facets():
+    request = SearchRequest(
+        text="adaptation",
+        span_types=["Adaptation – All"],
+        group_by_document=True,
+        facets=True,
+    )
+    query_body = build_search_query(request)
+
+    assert query_body["aggs"]["document_count"] == {
+        "filter": query_body["post_filter"],
+        "aggs": {"documents": {"cardinality": {"field": "document_id"}}},
+    }
+    assert query_body["post_filter"]["bool"]["filter"] == [
+        {"terms": {"span_types": ["Adaptation – All"]}}
+    ]
+
+
+def test_build_search_query_limits_expensive_searches():
+    with patch("src.opensearch.query.config.SEARCH_TERMINATE_AFTER", 1000):
+        text_query = build_search_query(SearchRequest(text="coal"))
+        facet_query = build_search_query(SearchRequest(text="coal", facets=True))
+        pit_query = build_search_query(SearchRequest(text="coal"), pit_id="pit-id")
+
+    assert text_query["timeout"] == "5s"
+    assert text_query["terminate_after"] == 1000
+    assert "terminate_after" not in facet_query
+    assert "terminate_after" not in pit_query
+
+
+def test_search_request_limit_is_capped():
+    with pytest.raises(ValueError):
+        SearchRequest(text="", limit=10_000)
+
+
+def test_build_search_query_uses_date_index_sort():
+    with patch("src.opensearch.query.config.SEARCH_INDEX_SORTED_BY_DATE", True):
+        newest_first = build_search_query(SearchRequest(text="", sort_field="date"))
+        oldest_first = build_search_query(
+            SearchRequest(text="", sort_field="date", sort_order="asc")
+        )
+        exact_total = build_search_query(
+            SearchRequest(text="", sort_field="date", track_total_hits=True)
+        )
+        pit_query = build_search_query(
+            SearchRequest(text="", sort_field="date"), pit_id="pit-id"
+        )
+
+    assert (
+        newest_first["sort"] == [{"document_metadata.date": "desc"}] + TIEBREAKER_SORT
+    )
+    assert newest_first["track_total_hits"] == 1000
+    assert oldest_first["sort"] == [{"document_metadata.date": "asc"}]
+    assert "track_total_hits" not in oldest_first
+    assert exact_total["track_total_hits"] is True
+    assert pit_query["sort"] == newest_first["sort"]
+
+
+def test_with_date_index_sort():
+    sorted_settings = with_date_index_sort(index_settings)
+
+    assert sorted_settings["settings"]["index"]["sort.field"] == [
+        "document_metadata.date",
+        "document_id",
+        "text_block_id",
+    ]
+    assert "sort.field" not in index_settings["settings"]["index"]
@@ -0,0 +1,88 @@
+from src.opensearch.response import compact_search_response, format_facets
+
+
+def test_compact_search_response_deduplicates_documents():
+    source = {
+        "document_id": "doc-1",
+        "document_name": "Document 1",
+        "document_metadata": {"author": ["Party"]},
+        "text_block_id": "b1",
+        "text": "some text",
+        "text_html": "<p>some text</p>",
+    }
+    opns_result = {
+        "took": 3,
+        "hits": {
+            "total": {"value": 2, "relation": "eq"},
+            "hits": [
+                {"_id": "1", "_score": 1.0, "_source": source},
+                {
+                    "_id": "2",
+                    "_score": 0.5,
+                    "_source": source | {"text_block_id": "b2"},
+                    "highlight": {"text_html": ["<p><mark>some</mark> text</p>"]},
+                },
+            ],
+        },
+    }
+
+    response = compact_search_response(opns_result)
+
+    assert response["documents"] == {
+        "doc-1": {
+            "document_name": "Document 1",
+            "document_metadata": {"author": ["Party"]},
+        }
+    }
+    assert response["hits"][0]["passage"] == {
+        "text_block_id": "b1",
+        "text": "some text",
+    }
+    assert response["hits"][0]["text_html"] == "<p>some text</p>"
+    assert response["hits"][1]["text_html"] == "<p><mark>some</mark> text</p>"
+    assert response["total"]["value"] == 2
+
+
+def test_format_facets():
+    aggregations = {
+        "is_party": {
+            "doc_count": 3,
+            "values": {
+                "buckets": [
+                    {"key": 1, "key_as_string": "true", "doc_count": 2},
+                    {"key": 0, "key_as_string": "false", "doc_count": 1},
+                ]
+            },
+        },
+        "authors": {
+            "doc_count": 3,
+            "values": {"buckets": [{"key": "A", "doc_count": 3}]},
+        },
+    }
+
+    assert format_facets(aggregations) == {
+        "is_party": {"true": 2, "false": 1},
+        "authors": {"A": 3},
+    }
+
+
+def test_compact_search_response_grouped_by_document():
+    passage = {"_id": "2", "_source": {"document_id": "doc-1", "text": "passage"}}
+    opns_result = {
+        "hits": {
+            "hits": [
+                {
+                    "_id": "1",
+                    "_source": {"document_id": "doc-1", "document_name": "Document 1"},
+                    "inner_hits": {"passages": {"hits": {"hits": [passage]}}},
+                }
+            ]
+        },
+        "total_documents": 1,
+    }
+
+    response = compact_search_response(opns_result)
+
+    assert response["hits"][0]["passages"][0]["passage"] == {"text": "passage"}
+    assert response["documents"]["doc-1"] == {"document_name": "Document 1"}
+    assert response["total_documents"] == 1